@@ -1,7 +1,19 @@
 import os
+import re
 import sys
+import json
+import time
+import errno
+import string
+import threading
 import subprocess
 import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+PREVIEW_LINES = 20
+SYNC_INTERVAL = 0.05  # seconds between journal fsyncs while renaming
+TEMP_NAME = re.compile(r'\..*\.renametmp\d+')
 
 def runFzf(files):
     if not files:
@@ -72,12 +84,345 @@ def confirmAndRename(renames):
     else:
         print("Cancelled.")
 
+CASES = {'u': str.upper, 'l': str.lower, 't': str.title, 'c': str.capitalize}
+
+class NameFormatter(string.Formatter):
+    """str.format with extra !u/!l/!t/!c conversions for upper, lower, title and capitalized case."""
+    def convert_field(self, value, conversion):
+        if conversion in CASES:
+            return CASES[conversion](str(value))
+        return super().convert_field(value, conversion)
+
+def scanDirs(root, recursive=False):
+    """Yield (dirPath, every entry name, sorted file names) for root and, if recursive, its subdirectories."""
+    stack = [root]
+    while stack:
+        dirPath = stack.pop()
+        names, files = set(), []
+        try:
+            with os.scandir(dirPath) as entries:
+                for entry in entries:
+                    names.add(entry.name)
+                    if entry.is_file():
+                        files.append(entry.name)
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+        except OSError as e:
+            print(f"Error: {e}")
+            continue
+        yield dirPath, names, sorted(files)
+
+def resolveCollisions(names, moves, problems):
+    """Drop moves that would clobber a name; dropping one can block another, so repeat until none do."""
+    while True:
+        claims = {}
+        for old, new in moves.items():
+            claims.setdefault(new, []).append(old)
+        blocked = {}
+        for new, olds in claims.items():
+            if len(olds) > 1:
+                for old in olds:
+                    blocked[old] = f"'{new}' is also the target of {len(olds) - 1} other file(s)"
+            elif new in names and new not in moves:
+                blocked[olds[0]] = f"'{new}' exists"
+        if not blocked:
+            return moves
+        for old, reason in blocked.items():
+            problems.append((old, reason))
+            del moves[old]
+
+def orderMoves(names, moves):
+    """Order one directory's {old: new} moves so no step overwrites a name still waiting to move.
+
+    Chains run from their free end; what is left are cycles (a->b, b->a),
+    each broken by moving one member to a temporary name first.
+    """
+    taken = names | set(moves.values())
+    target = dict(moves)
+    wanting = {new: old for old, new in moves.items()}
+    ready = [old for old, new in moves.items() if new not in moves][::-1]
+    steps = []
+    while target:
+        while ready:
+            old = ready.pop()
+            steps.append((old, target.pop(old)))
+            # old's name is free now, so whoever wanted it can move
+            if wanting.get(old) in target:
+                ready.append(wanting[old])
+        if target:
+            old = next(iter(target))
+            i = 0
+            while f".{old}.renametmp{i}" in taken:
+                i += 1
+            tmp = f".{old}.renametmp{i}"
+            taken.add(tmp)
+            steps.append((old, tmp))
+            target[tmp] = target.pop(old)
+            wanting[target[tmp]] = tmp
+            ready.append(wanting[old])
+    return steps
+
+def planRenames(root, pattern, template, recursive=False, start=1, step=1):
+    """Return ({dirPath: [(old, new), ...]}, [(path, reason), ...]) for files whose name matches pattern.
+
+    The template is formatted with the match ({0}, {1}, named groups) plus
+    {name}, {stem}, {ext}, {parent}, a counter {n}, and {mtime}/{today}
+    datetimes, e.g. '{stem!l}_{n:03}{ext}' or '{mtime:%Y-%m-%d}_{name}'.
+    """
+    formatter = NameFormatter()
+    needStat = any(field and re.match(r'mtime\b', field) for _, field, _, _ in formatter.parse(template))
+    today = datetime.now()
+    counter = start
+    plan, problems = {}, []
+    for dirPath, names, files in sorted(scanDirs(root, recursive)):
+        parent = os.path.basename(os.path.abspath(dirPath))
+        moves, dirProblems = {}, []
+        for name in files:
+            match = pattern.search(name)
+            if not match:
+                continue
+            stem, ext = os.path.splitext(name)
+            fields = dict(match.groupdict(default=''), name=name, stem=stem, ext=ext, parent=parent, n=counter, today=today)
+            if needStat:
+                fields['mtime'] = datetime.fromtimestamp(os.stat(os.path.join(dirPath, name)).st_mtime)
+            newName = formatter.format(template, match.group(0), *match.groups(default=''), **fields)
+            counter += step
+            if newName == name:
+                continue
+            if newName in ('', '.', '..') or '/' in newName or os.sep in newName:
+                dirProblems.append((name, f"invalid new name '{newName}'"))
+                continue
+            moves[name] = newName
+        moves = resolveCollisions(names, moves, dirProblems)
+        problems += [(os.path.join(dirPath, name), reason) for name, reason in dirProblems]
+        if moves:
+            plan[dirPath] = orderMoves(names, moves)
+    return plan, problems
+
+def defaultJournalPath():
+    base = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+    return os.path.join(base, 'batch_file_renamer', f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+
+def writeJournal(path, plan):
+    """Write and fsync every planned step before the first rename, one JSON line per directory."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        for dirPath, steps in plan.items():
+            f.write(json.dumps({'dir': os.path.abspath(dirPath), 'steps': steps}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+class StepLog:
+    """Appends {'dir', 'done'} lines to a journal: the first `done` steps of dir are applied.
+
+    Lines are written at once but fsynced in groups, at most SYNC_INTERVAL
+    apart, so the markers on disk may trail the renames; inferDone works out
+    how far past its last marker a directory got. A durable mark waits for
+    its own fsync. Steps that create a temp name are marked durably, which
+    keeps a whole rename cycle from ever falling past the last marker.
+    """
+    def __init__(self, path):
+        self.f = open(path, 'a')
+        self.lock = threading.Lock()
+        self.lastSync = time.monotonic()
+
+    def mark(self, dirPath, done, undo=False, durable=False):
+        record = {'dir': os.path.abspath(dirPath), 'done': done}
+        if undo:
+            record['undo'] = True
+        with self.lock:
+            self.f.write(json.dumps(record) + '\n')
+            self.f.flush()
+            now = time.monotonic()
+            due = durable or now - self.lastSync >= SYNC_INTERVAL
+            if due:
+                self.lastSync = now
+        if due:
+            os.fsync(self.f.fileno())  # outside the lock, so other directories keep going
+
+    def close(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+def readJournal(path):
+    """Return ({dir: steps}, {dir: (steps applied, whether a rollback wrote it)}); the last marker wins."""
+    plan, applied = {}, {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # torn final line from a crash
+            if 'steps' in record:
+                plan[record['dir']] = record['steps']
+            else:
+                applied[record['dir']] = (record['done'], record.get('undo', False))
+    return plan, applied
+
+def inferDone(dirPath, steps, done, up):
+    """How many of dirPath's steps are applied now, given a marker of `done` and renames going up or down.
+
+    A step that creates a temp name is marked durably (see StepLog), so the
+    renames can't have got past the first such step beyond the marker. Only
+    the names touched by the steps up to there are checked, replaying them
+    in order against what exists on disk. That stretch holds no complete
+    rename cycle, so exactly one count can match.
+    """
+    if up:
+        stop = next((i + 1 for i in range(done, len(steps)) if TEMP_NAME.fullmatch(steps[i][1])), len(steps))
+        window = steps[done:stop]
+    else:
+        stop = next((i for i in range(done - 1, -1, -1) if TEMP_NAME.fullmatch(steps[i][0])), 0)
+        window = steps[stop:done][::-1]
+    expected = {}
+    for old, new in window:
+        # the first time a name is met from done's side tells its state at done
+        expected.setdefault(old, up)
+        expected.setdefault(new, not up)
+    actual = {name: os.path.lexists(os.path.join(dirPath, name)) for name in expected}
+    mismatches = sum(expected[name] != actual[name] for name in expected)
+
+    def put(name, value):
+        nonlocal mismatches
+        mismatches += (value != actual[name]) - (expected[name] != actual[name])
+        expected[name] = value
+
+    found = [done] if not mismatches else []
+    for k, (old, new) in enumerate(window, 1):
+        put(old, not up)
+        put(new, up)
+        if not mismatches:
+            found.append(done + k if up else done - k)
+    if len(found) != 1:
+        raise OSError(errno.EIO, "Files no longer match the journal", dirPath)
+    return found[0]
+
+def applySteps(dirPath, steps, failed, progress):
+    for i, (old, new) in enumerate(steps):
+        if failed.is_set():
+            return
+        newPath = os.path.join(dirPath, new)
+        # os.rename silently replaces; refuse if something appeared since planning
+        if os.path.lexists(newPath):
+            raise FileExistsError(errno.EEXIST, "Target appeared after planning", newPath)
+        os.rename(os.path.join(dirPath, old), newPath)
+        progress.mark(dirPath, i + 1, durable=bool(TEMP_NAME.fullmatch(new)))
+
+def undoSteps(dirPath, steps, marker, progress):
+    """Reverse the steps of dirPath that are applied; marker is its last (done, undo) journal entry."""
+    done, undoing = marker
+    done = inferDone(dirPath, steps, done, not undoing)
+    if not done:
+        return 0
+    # from here on markers count down, so a later rollback searches downward from them
+    progress.mark(dirPath, done, undo=True, durable=True)
+    for i in range(done - 1, -1, -1):
+        old, new = steps[i]
+        oldPath = os.path.join(dirPath, old)
+        if os.path.lexists(oldPath):
+            raise FileExistsError(errno.EEXIST, "Refusing to overwrite", oldPath)
+        os.rename(os.path.join(dirPath, new), oldPath)
+        progress.mark(dirPath, i, undo=True, durable=bool(TEMP_NAME.fullmatch(old)))
+    return done
+
+def runPerDir(func, plan, jobs):
+    """Run func(dirPath, steps, failed) for each directory on a thread pool; returns (results, errors)."""
+    failed = threading.Event()
+    errors = []
+
+    def work(item):
+        try:
+            return func(item[0], item[1], failed)
+        except OSError as e:
+            errors.append(e)
+            failed.set()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = [r for r in executor.map(work, plan.items()) if r]
+    return results, errors
+
+def rollback(journal, jobs=None):
+    plan, applied = readJournal(journal)
+    progress = StepLog(journal)
+    try:
+        results, errors = runPerDir(lambda dirPath, steps, failed: undoSteps(dirPath, steps, applied.get(dirPath, (0, False)), progress),
+                                    plan, jobs)
+    finally:
+        progress.close()
+    for e in errors:
+        print(f"Error rolling back: {e}")
+    print(f"Rolled back {sum(results)} rename(s) from {journal}")
+    return not errors
+
+def bulkRename(plan, jobs=None, journal=None):
+    """Apply a plan from planRenames; on any error, everything already renamed is put back."""
+    journal = journal or defaultJournalPath()
+    writeJournal(journal, plan)
+    progress = StepLog(journal)
+    try:
+        _, errors = runPerDir(lambda dirPath, steps, failed: applySteps(dirPath, steps, failed, progress), plan, jobs)
+    finally:
+        progress.close()
+    if errors:
+        for e in errors:
+            print(f"Error renaming: {e}")
+        rollback(journal, jobs)
+        return False
+    print(f"Applied {sum(len(steps) for steps in plan.values())} rename(s). Undo with --rollback {journal}")
+    return True
+
+def bulkMode(args):
+    try:
+        pattern = re.compile(args.match)
+    except re.error as e:
+        sys.exit(f"Invalid --match pattern: {e}")
+    try:
+        plan, problems = planRenames(args.directory, pattern, args.to, args.recursive, args.start, args.step)
+    except (KeyError, IndexError, ValueError) as e:
+        sys.exit(f"Invalid --to template: {e!r}")
+    for path, reason in problems:
+        print(f"Skipping '{path}': {reason}")
+    if not plan:
+        print("Nothing to rename.")
+        return
+    renames = [(os.path.join(dirPath, old), new) for dirPath, steps in plan.items() for old, new in steps]
+    print("\n--- Preview ---")
+    for old, new in renames if args.dry_run else renames[:PREVIEW_LINES]:
+        print(f"{old} -> {new}")
+    if len(renames) > PREVIEW_LINES and not args.dry_run:
+        print(f"... and {len(renames) - PREVIEW_LINES} more")
+    if args.dry_run:
+        return
+    if args.yes or input("\nProceed? (yes/no): ").strip().lower() == 'yes':
+        if not bulkRename(plan, args.jobs, args.journal):
+            sys.exit(1)
+    else:
+        print("Cancelled.")
+
 def main():
     parser = argparse.ArgumentParser(description="Fuzzy-based File Renamer")
-    parser.add_argument("mode", nargs="?", help="interactive or pattern")
+    parser.add_argument("mode", nargs="?", help="interactive, pattern or bulk")
     parser.add_argument("directory", nargs="?", default=".", help="Target directory (default: current)")
+    parser.add_argument("--match", default="", help="bulk: regex selecting file names (default: all)")
+    parser.add_argument("--to", help="bulk: new-name template, e.g. '{stem!l}_{n:03}{ext}'")
+    parser.add_argument("-r", "--recursive", action="store_true", help="bulk: include subdirectories")
+    parser.add_argument("--start", type=int, default=1, help="bulk: first value of the {n} counter")
+    parser.add_argument("--step", type=int, default=1, help="bulk: counter increment")
+    parser.add_argument("--dry-run", action="store_true", help="bulk: print the full plan and exit")
+    parser.add_argument("--yes", action="store_true", help="bulk: don't ask for confirmation")
+    parser.add_argument("-j", "--jobs", type=int, help="bulk: directories renamed in parallel")
+    parser.add_argument("--journal", help="bulk: write-ahead journal path (default: under $XDG_STATE_HOME)")
+    parser.add_argument("--rollback", metavar="JOURNAL", help="Undo the renames recorded in a journal")
     args = parser.parse_args()
 
+    if args.rollback:
+        sys.exit(0 if rollback(args.rollback, args.jobs) else 1)
+    if args.mode == 'bulk':
+        if args.to is None:
+            parser.error("bulk mode needs --to")
+        bulkMode(args)
+        return
+
     path = args.directory
     files = getFiles(path)
     if not files:
@@ -101,7 +446,7 @@ def main():
             print("Cancelled.")
             return
     elif mode not in ['interactive', 'pattern']:
-        print("Invalid mode. Choose 'interactive' or 'pattern'.")
+        print("Invalid mode. Choose 'interactive', 'pattern' or 'bulk'.")
         return
 
     renames = interactiveRename(selected) if mode == 'interactive' else patternRename(selected)
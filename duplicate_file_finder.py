@@ -1,29 +1,400 @@
-import os, argparse
-from collections import defaultdict
+import os, sys, stat, json, mmap, time, shutil, struct, sqlite3, tempfile, argparse, hashlib, threading, importlib.util
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+EDGE = 4096        # bytes hashed from each end of a file in the partial pass
+CHUNK = 1 << 20    # read size for the full hash pass
+CACHE_MAX_AGE = 30 * 24 * 3600   # drop cache rows not seen for this many seconds
+BATCH = 4096       # candidate files hashed per batch before results are emitted
+SPILL_PARTS = 64   # hash partitions used once size buckets overflow to disk
+
+# the only stat fields the pipeline needs; attribute names match os.stat_result
+FileMeta = namedtuple("FileMeta", "st_dev st_ino st_size st_mtime_ns")
+RECORD = struct.Struct("<QQq")   # dev, ino, mtime_ns; the fs-encoded path follows
+SPILLED = struct.Struct("<QI")   # size, record length
+FICLONE = 0x40049409             # linux/fs.h ioctl, shares extents on btrfs/xfs
+IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp'}
+
+def defaultCachePath(suffix="sqlite"):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, f"duplicate_file_finder.{suffix}")
+
+def defaultJournalPath(dir):
+    # one journal per root, so an interrupted run elsewhere is not resumed against this tree
+    key = hashlib.sha1(os.path.abspath(dir).encode()).hexdigest()[:16]
+    return defaultCachePath(f"{key}.journal")
+
+class HashCache:
+    """On-disk (st_dev, st_ino) -> digest map, valid only while size and mtime_ns match."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS hashes (
+            dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+            partial TEXT, full TEXT, seen INTEGER, PRIMARY KEY (dev, ino))""")
+        self.now = int(time.time())
+        self.hits = []
+
+    def get(self, meta, partial):
+        row = self.db.execute("SELECT size, mtime_ns, partial, full FROM hashes WHERE dev=? AND ino=?",
+                              (meta.st_dev, meta.st_ino)).fetchone()
+        if not row or row[0] != meta.st_size or row[1] != meta.st_mtime_ns: return None
+        digest = row[2] if partial else row[3]
+        if digest: self.hits.append((self.now, meta.st_dev, meta.st_ino))
+        return digest
+
+    def put(self, meta, partial, digest):
+        # a changed size/mtime invalidates whichever digest we are not writing now
+        self.db.execute("""INSERT INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dev, ino) DO UPDATE SET
+              partial = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                             THEN coalesce(excluded.partial, partial) ELSE excluded.partial END,
+              full = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns
+                          THEN coalesce(excluded.full, full) ELSE excluded.full END,
+              size = excluded.size, mtime_ns = excluded.mtime_ns, seen = excluded.seen""",
+            (meta.st_dev, meta.st_ino, meta.st_size, meta.st_mtime_ns,
+             digest if partial else None, None if partial else digest, self.now))
+
+    def close(self):
+        self.db.executemany("UPDATE hashes SET seen=? WHERE dev=? AND ino=?", self.hits)
+        self.db.execute("DELETE FROM hashes WHERE seen < ?", (self.now - CACHE_MAX_AGE,))
+        self.db.commit()
+        self.db.close()
+
+class SizeBuckets:
+    """size -> packed file records, spilled to hash-partitioned temp files past `limit` bytes."""
+
+    def __init__(self, limit):
+        self.mem = defaultdict(list)
+        self.used = 0
+        self.limit = limit
+        self.parts = None
+
+    def add(self, path, meta):
+        rec = RECORD.pack(meta.st_dev, meta.st_ino, meta.st_mtime_ns) + os.fsencode(path)
+        self.mem[meta.st_size].append(rec)
+        self.used += len(rec) + 64   # rough per-record list/bytes overhead
+        if self.used > self.limit: self.spill()
+
+    def spill(self):
+        if self.parts is None: self.parts = [tempfile.TemporaryFile() for _ in range(SPILL_PARTS)]
+        for size, recs in self.mem.items():
+            self.parts[size % SPILL_PARTS].write(b"".join(SPILLED.pack(size, len(r)) + r for r in recs))
+        self.mem.clear()
+        self.used = 0
+
+    @staticmethod
+    def unpack(size, rec):
+        dev, ino, mtime = RECORD.unpack_from(rec)
+        return os.fsdecode(rec[RECORD.size:]), FileMeta(dev, ino, size, mtime)
+
+    def groups(self):
+        """Yield (size, [(path, meta), ...]) for every size shared by two or more files."""
+        if self.parts is None:
+            for size, recs in self.mem.items():
+                if len(recs) > 1: yield size, [self.unpack(size, r) for r in recs]
+            return
+        self.spill()
+        for f in self.parts:
+            f.seek(0)
+            data, pos, part = f.read(), 0, defaultdict(list)
+            f.close()
+            while pos < len(data):
+                size, n = SPILLED.unpack_from(data, pos)
+                pos += SPILLED.size
+                part[size].append(data[pos:pos + n])
+                pos += n
+            del data
+            for size, recs in part.items():
+                if len(recs) > 1: yield size, [self.unpack(size, r) for r in recs]
 
 def getMeta(path):
-    try: return os.stat(path).st_size, os.stat(path).st_mtime
-    except: return None
+    try: meta = os.lstat(path)
+    except OSError: return None
+    return meta if stat.S_ISREG(meta.st_mode) else None
 
-def findDupes(dir):
-    files = defaultdict(list)
+def walkFiles(dir):
     for root, _, names in os.walk(dir):
         for name in names:
             path = os.path.join(root, name)
             meta = getMeta(path)
-            if meta: files[meta].append(path)
-    return {k: v for k, v in files.items() if len(v) > 1}
+            if meta: yield path, meta
+
+def hashFile(path, size, partial=False):
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            if partial:
+                h.update(f.read(EDGE))
+                if size > EDGE:
+                    f.seek(max(EDGE, size - EDGE))
+                    h.update(f.read(EDGE))
+            else:
+                buf = bytearray(CHUNK)
+                view = memoryview(buf)
+                while n := f.readinto(buf): h.update(view[:n])
+    except OSError: return None
+    return h.hexdigest()
+
+def regroup(groups, pool, cache=None, partial=False):
+    """Split each (size, files) group by digest, dropping groups left with one file."""
+    split, jobs = defaultdict(list), []
+    for size, files in groups:
+        for path, meta in files:
+            digest = cache.get(meta, partial) if cache else None
+            if digest: split[size, digest].append((path, meta))
+            else: jobs.append((size, path, meta))
+    # cache lookups and writes stay on this thread; only the hashing is pooled
+    digests = pool.map(lambda j: hashFile(j[1], j[0], partial), jobs)
+    for (size, path, meta), digest in zip(jobs, digests):
+        if digest is None: continue
+        if cache: cache.put(meta, partial, digest)
+        split[size, digest].append((path, meta))
+    return [(k, v) for k, v in split.items() if len(v) > 1]
+
+def confirm(groups, pool, cache):
+    """Yield (size, digest, paths) for each group of identical files within `groups`."""
+    partial = regroup(groups, pool, cache, partial=True)
+    # the partial pass already read the whole of any file no larger than 2*EDGE
+    big = []
+    for (size, digest), files in partial:
+        if size <= 2 * EDGE: yield size, digest, [p for p, _ in files]
+        else: big.append((size, files))
+    for (size, digest), files in regroup(big, pool, cache):
+        yield size, digest, [p for p, _ in files]
+
+def iterDupes(dir, workers=8, cache=None, memLimit=256 << 20):
+    """Yield duplicate groups batch by batch once the stat walk is done."""
+    buckets = SizeBuckets(memLimit)
+    for path, meta in walkFiles(dir): buckets.add(path, meta)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch, queued = [], 0
+        for size, files in buckets.groups():
+            batch.append((size, files))
+            queued += len(files)
+            if queued >= BATCH:
+                yield from confirm(batch, pool, cache)
+                batch, queued = [], 0
+        yield from confirm(batch, pool, cache)
+
+def findDupes(dir, workers=8, cache=None, memLimit=256 << 20):
+    return {(size, digest): paths for size, digest, paths in iterDupes(dir, workers, cache, memLimit)}
+
+def dhash(path):
+    """64-bit difference hash of a 9x8 grayscale thumbnail, or None if it can't be decoded."""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            img.draft('L', (64, 64))   # lets the JPEG decoder downscale while decoding
+            px = list(img.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    except Exception: return None
+    bits = 0
+    for row in range(0, 72, 9):
+        for col in range(row, row + 8): bits = (bits << 1) | (px[col] > px[col + 1])
+    return bits
+
+class BKTree:
+    """Metric tree over 64-bit hashes under Hamming distance."""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, h, item):
+        if self.root is None:
+            self.root = (h, [item], {})
+            return
+        node = self.root
+        while True:
+            d = (h ^ node[0]).bit_count()
+            if d == 0: return node[1].append(item)
+            if d not in node[2]:
+                node[2][d] = (h, [item], {})
+                return
+            node = node[2][d]
+
+    def query(self, h, maxDistance):
+        """Yield every item whose hash is within maxDistance bits of h."""
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = (h ^ node[0]).bit_count()
+            if d <= maxDistance: yield from node[1]
+            stack.extend(child for k, child in node[2].items() if d - maxDistance <= k <= d + maxDistance)
+
+def findSimilar(dir, maxDistance=10, workers=None):
+    """Group images whose perceptual hashes are within maxDistance bits of each other."""
+    paths = [p for p, _ in walkFiles(dir) if os.path.splitext(p)[1].lower() in IMAGE_EXTS]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(dhash, paths, chunksize=64))
+
+    parent = list(range(len(paths)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        if h is None: continue
+        for j in tree.query(h, maxDistance): parent[find(j)] = find(i)
+        tree.add(h, i)
+
+    groups = defaultdict(list)
+    for i, h in enumerate(hashes):
+        if h is not None: groups[find(i)].append(paths[i])
+    return [g for g in groups.values() if len(g) > 1]
+
+def sameContent(a, b):
+    """Byte-compare two files through mmap, one CHUNK at a time."""
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        size = os.fstat(fa.fileno()).st_size
+        if size != os.fstat(fb.fileno()).st_size: return False
+        if size == 0: return True
+        with mmap.mmap(fa.fileno(), 0, access=mmap.ACCESS_READ) as ma, \
+             mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mb:
+            for off in range(0, size, CHUNK):
+                if ma[off:off + CHUNK] != mb[off:off + CHUNK]: return False
+    return True
+
+def tmpName(path):
+    head, tail = os.path.split(path)
+    return os.path.join(head, f".{tail}.dupetmp")
+
+class Journal:
+    """Append-only log of reclaim steps; a leftover journal means the last run was interrupted."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        begun, self.done = set(), set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try: entry = json.loads(line)
+                    except ValueError: continue   # torn final line
+                    (begun if entry["state"] == "begin" else self.done).add(entry["path"])
+        for path in begun - self.done:
+            try: os.remove(tmpName(path))
+            except FileNotFoundError: pass
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.f = open(self.path, 'a')
+
+    def log(self, state, path, **extra):
+        with self.lock:
+            self.f.write(json.dumps({"state": state, "path": path, **extra}) + "\n")
+            self.f.flush()
+
+    def finish(self):
+        self.f.close()
+        os.remove(self.path)
+
+def replaceWith(keep, path, action):
+    if action == "delete": return os.remove(path)
+    tmp = tmpName(path)
+    if action == "hardlink": os.link(keep, tmp)
+    else: open(tmp, 'xb').close()
+    try:
+        if action == "reflink":
+            with open(keep, 'rb') as src, open(tmp, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(path, tmp)
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
+
+def reclaimGroup(paths, action, journal):
+    """Verify and replace every copy in one duplicate group; returns bytes freed."""
+    files = [(p, m) for p in paths if (m := getMeta(p))]
+    # links only work within one filesystem, so each device keeps its own copy
+    byDev = defaultdict(list)
+    for p, m in files: byDev[None if action == "delete" else m.st_dev].append((p, m))
+    freed = 0
+    for members in byDev.values():
+        (keep, keepMeta), rest = members[0], members[1:]
+        for path, meta in rest:
+            if path in journal.done or (meta.st_dev, meta.st_ino) == (keepMeta.st_dev, keepMeta.st_ino):
+                continue
+            try:
+                if not sameContent(keep, path):
+                    print(f"skip (content differs): {path}")
+                    continue
+                journal.log("begin", path, keep=keep, action=action)
+                replaceWith(keep, path, action)
+                journal.log("done", path)
+            except OSError as e:
+                print(f"failed {action} {path}: {e}")
+                continue
+            freed += meta.st_size if meta.st_nlink == 1 else 0
+            print(f"{action}: {path} -> {keep}")
+    return freed
+
+def reclaim(dupes, action, journal, workers=8):
+    # empty files all hash alike but are unrelated, and replacing them frees nothing
+    dupes = (g for g in dupes if g[0])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        freed = sum(pool.map(lambda g: reclaimGroup(g[2], action, journal), dupes))
+    journal.finish()
+    print(f"Reclaimed {freed} bytes.")
+
+def giveSimilar(groups):
+    if not groups: return print("No similar images found.")
+    print("Similar Images Found:\n")
+    for i, paths in enumerate(groups, 1):
+        print(f"[{i}] {len(paths)} images")
+        for p in paths: print(f"   - {p}")
+        print()
 
 def giveDupes(dupes):
     if not dupes: return print("No duplicates found.")
     print("Duplicate Files Found:\n")
-    for i, (meta, paths) in enumerate(dupes.items(), 1):
-        print(f"[{i}] Metadata: {meta}")
+    for i, ((size, digest), paths) in enumerate(dupes.items(), 1):
+        print(f"[{i}] Size: {size} bytes, Hash: {digest}")
         for p in paths: print(f"   - {p}")
         print()
 
+def streamDupes(dupes):
+    for size, digest, paths in dupes:
+        sys.stdout.write(json.dumps({"size": size, "hash": digest, "paths": paths}) + "\n")
+        sys.stdout.flush()
+
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("directory")
+    p.add_argument("-j", "--workers", type=int, default=min(32, (os.cpu_count() or 1) * 2), help="hashing threads (worker processes with --similar-images)")
+    p.add_argument("--cache", default=defaultCachePath(), help="hash cache file (default: %(default)s)")
+    p.add_argument("--no-cache", action="store_true", help="do not read or write the hash cache")
+    p.add_argument("--jsonl", action="store_true", help="stream one JSON object per duplicate group as it is confirmed")
+    p.add_argument("--mem-limit", type=int, default=256, help="MiB of file records kept in memory before spilling to disk")
+    p.add_argument("--similar-images", action="store_true", help="group near-duplicate images by perceptual hash instead")
+    p.add_argument("--distance", type=int, default=10, help="max differing dHash bits for --similar-images (0-64)")
+    p.add_argument("--reclaim", choices=["hardlink", "reflink", "delete"], help="replace verified duplicates to free space")
+    p.add_argument("--journal", help="reclaim journal used to resume (default: one per directory in the cache dir)")
     args = p.parse_args()
-    giveDupes(findDupes(args.directory))
+
+    if args.reclaim == "reflink" and fcntl is None: raise SystemExit("--reclaim reflink needs fcntl, which this platform lacks")
+    if args.similar_images:
+        if importlib.util.find_spec("PIL") is None: raise SystemExit("--similar-images needs Pillow: pip install Pillow")
+        groups = findSimilar(args.directory, args.distance, args.workers)
+        if args.jsonl:
+            for g in groups: print(json.dumps({"paths": g}), flush=True)
+        else: giveSimilar(groups)
+    else:
+        cache = None if args.no_cache else HashCache(args.cache)
+        try:
+            if args.reclaim: reclaim(iterDupes(args.directory, args.workers, cache, args.mem_limit << 20),
+                                     args.reclaim, Journal(args.journal or defaultJournalPath(args.directory)), args.workers)
+            elif args.jsonl: streamDupes(iterDupes(args.directory, args.workers, cache, args.mem_limit << 20))
+            else: giveDupes(findDupes(args.directory, args.workers, cache, args.mem_limit << 20))
+        finally:
+            if cache: cache.close()
@@ -1,7 +1,34 @@
 import os
+import sys
+import json
+import mmap
 import stat
+import queue
+import struct
 import platform
 import getpass
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pwd
+    import grp
+except ImportError:
+    pwd = grp = None
+
+# (read, write, execute) bits for the owner, group and others classes
+OWNER_BITS = (stat.S_IRUSR, stat.S_IWUSR, stat.S_IXUSR)
+GROUP_BITS = (stat.S_IRGRP, stat.S_IWGRP, stat.S_IXGRP)
+OTHER_BITS = (stat.S_IROTH, stat.S_IWOTH, stat.S_IXOTH)
+ANY_EXEC = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+# Snapshot file: header, root path, then fixed-width records sorted by
+# (directory, name) and finally the heap of relative paths they point into.
+# Header: magic, record count, root path length, heap offset.
+# Record: path offset in heap, path length, mode, uid, gid.
+SNAPSHOT_MAGIC = b"PERMSNP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQQQ")
+SNAPSHOT_RECORD = struct.Struct("<QIIII")
 
 def checkPermissions(path):
     if not os.path.exists(path):
@@ -46,6 +73,303 @@ def checkPermissions(path):
         print("Windows does not provide POSIX-style permission bits.")
         print("Use 'icacls' or 'Get-Acl' in PowerShell for detailed access control.")
 
+def effectiveAccess(info, uid, groups):
+    """rwx string for uid (with supplementary gids groups) from the mode bits alone.
+
+    Follows the kernel's permission check: root may read and write anything
+    and execute anything with an x bit (or a directory); everyone else gets
+    exactly one class, owner before group before others. ACLs and
+    capabilities are not consulted.
+    """
+    mode = info.st_mode
+    if uid == 0:
+        return "rw" + ("x" if stat.S_ISDIR(mode) or mode & ANY_EXEC else "-")
+    if info.st_uid == uid:
+        bits = OWNER_BITS
+    elif info.st_gid in groups:
+        bits = GROUP_BITS
+    else:
+        bits = OTHER_BITS
+    return "".join(c if mode & b else "-" for c, b in zip("rwx", bits))
+
+class OwnerNames:
+    """uid/gid to name lookups, cached; None marks an id with no passwd/group entry."""
+
+    def __init__(self):
+        self.users, self.groups = {}, {}
+
+    def user(self, uid):
+        if uid not in self.users:
+            try:
+                self.users[uid] = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                self.users[uid] = None
+        return self.users[uid]
+
+    def group(self, gid):
+        if gid not in self.groups:
+            try:
+                self.groups[gid] = grp.getgrgid(gid).gr_name
+            except KeyError:
+                self.groups[gid] = None
+        return self.groups[gid]
+
+def auditFlags(info, names):
+    mode = info.st_mode
+    flags = []
+    if mode & stat.S_IWOTH and not stat.S_ISLNK(mode) and not (stat.S_ISDIR(mode) and mode & stat.S_ISVTX):
+        flags.append("world-writable")  # sticky directories such as /tmp are writable by design
+    if stat.S_ISREG(mode):
+        if mode & stat.S_ISUID:
+            flags.append("setuid")
+        if mode & stat.S_ISGID:
+            flags.append("setgid")
+    if names.user(info.st_uid) is None:
+        flags.append("orphaned-uid")
+    if names.group(info.st_gid) is None:
+        flags.append("orphaned-gid")
+    return flags
+
+def auditRecord(path, info, uid, groups, names, showAll):
+    flags = auditFlags(info, names)
+    if not flags and not showAll:
+        return None
+    return json.dumps({"path": path, "type": stat.filemode(info.st_mode)[0], "mode": f"{stat.S_IMODE(info.st_mode):04o}",
+                       "uid": info.st_uid, "gid": info.st_gid, "owner": names.user(info.st_uid),
+                       "group": names.group(info.st_gid), "access": effectiveAccess(info, uid, groups), "flags": flags})
+
+def auditDir(path, dev, uid, groups, names, showAll):
+    """lstat every entry of one directory; returns (JSONL lines, subdirectories to descend into)."""
+    lines, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    lines.append(json.dumps({"path": entry.path, "error": e.strerror}))
+                    continue
+                if stat.S_ISDIR(info.st_mode) and (dev is None or info.st_dev == dev):
+                    subdirs.append(entry.path)
+                record = auditRecord(entry.path, info, uid, groups, names, showAll)
+                if record:
+                    lines.append(record)
+    except OSError as e:
+        lines.append(json.dumps({"path": path, "error": e.strerror}))
+    return lines, subdirs
+
+def walkTree(rootDir, scanDir, jobs=16):
+    """Run scanDir(path) -> (result, subdirs) on rootDir and every subdirectory it reports.
+
+    Directories are scanned on a thread pool (lstat releases the GIL) and
+    results are yielded in this thread as they finish, so memory holds the
+    directory frontier rather than the tree.
+    """
+    results = queue.SimpleQueue()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        def submit(path):
+            pool.submit(scanDir, path).add_done_callback(results.put)
+
+        submit(rootDir)
+        outstanding = 1
+        while outstanding:
+            result, subdirs = results.get().result()
+            outstanding += len(subdirs) - 1
+            for path in subdirs:
+                submit(path)
+            yield result
+
+def auditTree(rootDir, user=None, jobs=16, showAll=False, oneFileSystem=False, out=sys.stdout):
+    """Stream a JSONL permission audit of rootDir from the point of view of user.
+
+    Only flagged entries are written unless showAll. Returns (entries
+    written, directories scanned).
+    """
+    entry = pwd.getpwnam(user or getpass.getuser())
+    groups = frozenset(os.getgrouplist(entry.pw_name, entry.pw_gid))
+    names = OwnerNames()
+    info = os.lstat(rootDir)
+    dev = info.st_dev if oneFileSystem else None
+    written = scanned = 0
+    record = auditRecord(rootDir, info, entry.pw_uid, groups, names, showAll)
+    if record:
+        out.write(record + "\n")
+        written += 1
+
+    scan = lambda path: auditDir(path, dev, entry.pw_uid, groups, names, showAll)
+    for lines in walkTree(rootDir, scan, jobs):
+        scanned += 1
+        for line in lines:
+            out.write(line + "\n")
+        written += len(lines)
+    out.flush()
+    return written, scanned
+
+def snapshotDir(path, prefix, dev):
+    """lstat one directory's entries; returns ((relative dir, entries sorted by name), subdirectories)."""
+    entries, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    print(f"skipped {entry.path}: {e.strerror}", file=sys.stderr)
+                    continue
+                if stat.S_ISDIR(info.st_mode) and (dev is None or info.st_dev == dev):
+                    subdirs.append(entry.path)
+                entries.append((os.fsencode(entry.name), info.st_mode, info.st_uid, info.st_gid))
+    except OSError as e:
+        print(f"skipped {path}: {e.strerror}", file=sys.stderr)
+    entries.sort()
+    return (os.fsencode(path[len(prefix):]), entries), subdirs
+
+def writeSnapshot(rootDir, outPath, jobs=16, oneFileSystem=False):
+    """Record (path, mode, uid, gid) for everything below rootDir; returns the entry count.
+
+    Directories finish in any order, so each one's sorted entries are kept
+    until the walk ends, then written out by directory. Records and the path
+    heap are streamed into their sections of the file through two handles.
+    """
+    prefix = os.path.join(rootDir, "")
+    dev = os.lstat(rootDir).st_dev if oneFileSystem else None
+    dirs = dict(walkTree(rootDir, lambda path: snapshotDir(path, prefix, dev), jobs))
+    root = os.fsencode(os.path.abspath(rootDir))
+    count = sum(map(len, dirs.values()))
+    heapOffset = SNAPSHOT_HEADER.size + len(root) + count * SNAPSHOT_RECORD.size
+    tmp = f"{outPath}.tmp"
+    with open(tmp, "wb") as records, open(tmp, "r+b") as heap:
+        records.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, count, len(root), heapOffset) + root)
+        heap.seek(heapOffset)
+        offset = 0
+        for relDir in sorted(dirs):
+            dirPrefix = relDir + b"/" if relDir else b""
+            for name, mode, uid, gid in dirs[relDir]:
+                path = dirPrefix + name
+                records.write(SNAPSHOT_RECORD.pack(offset, len(path), mode, uid, gid))
+                heap.write(path)
+                offset += len(path)
+    os.replace(tmp, outPath)
+    return count
+
+def iterSnapshot(f):
+    """Yield (path, mode, uid, gid) from an open snapshot file, in file order, straight from an mmap."""
+    if os.fstat(f.fileno()).st_size < SNAPSHOT_HEADER.size:
+        raise ValueError("not a permission snapshot")
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, count, rootLen, heapOffset = SNAPSHOT_HEADER.unpack_from(mm)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a permission snapshot")
+        view = memoryview(mm)
+        start = SNAPSHOT_HEADER.size + rootLen
+        try:
+            for offset, length, mode, uid, gid in SNAPSHOT_RECORD.iter_unpack(view[start:heapOffset]):
+                yield mm[heapOffset + offset:heapOffset + offset + length], mode, uid, gid
+        finally:
+            view.release()
+
+def snapshotKey(path):
+    # records are ordered by (directory, name), not by the plain path bytes
+    head, _, name = path.rpartition(b"/")
+    return head, name
+
+def diffSnapshots(oldFile, newFile):
+    """Merge-join two snapshots; yield (change, path, old, new) with old/new as (mode, uid, gid) or None."""
+    old, new = iterSnapshot(oldFile), iterSnapshot(newFile)
+    a, b = next(old, None), next(new, None)
+    while a and b:
+        if a[0] == b[0]:
+            # the common case between two snapshots of one tree, decided without splitting keys
+            if a[1:] != b[1:]:
+                yield "changed", a[0], a[1:], b[1:]
+            a, b = next(old, None), next(new, None)
+        elif snapshotKey(a[0]) < snapshotKey(b[0]):
+            yield "removed", a[0], a[1:], None
+            a = next(old, None)
+        else:
+            yield "added", b[0], None, b[1:]
+            b = next(new, None)
+    while a:
+        yield "removed", a[0], a[1:], None
+        a = next(old, None)
+    while b:
+        yield "added", b[0], None, b[1:]
+        b = next(new, None)
+
+def attrsJson(attrs):
+    if attrs is None:
+        return None
+    mode, uid, gid = attrs
+    return {"type": stat.filemode(mode)[0], "mode": f"{stat.S_IMODE(mode):04o}", "uid": uid, "gid": gid}
+
+def describeAttrs(attrs):
+    mode, uid, gid = attrs
+    return f"{stat.filemode(mode)} {uid}:{gid}"
+
+def printDiff(oldPath, newPath, asJson=False):
+    changes = 0
+    with open(oldPath, "rb") as oldFile, open(newPath, "rb") as newFile:
+        for change, path, old, new in diffSnapshots(oldFile, newFile):
+            changes += 1
+            path = os.fsdecode(path)
+            if asJson:
+                sys.stdout.write(json.dumps({"path": path, "change": change, "old": attrsJson(old), "new": attrsJson(new)}) + "\n")
+            elif change == "added":
+                sys.stdout.write(f"+ {path}  {describeAttrs(new)}\n")
+            elif change == "removed":
+                sys.stdout.write(f"- {path}  {describeAttrs(old)}\n")
+            else:
+                sys.stdout.write(f"~ {path}  {describeAttrs(old)} -> {describeAttrs(new)}\n")
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description="Check file permissions, audit a whole tree as JSONL, or snapshot and diff ownership and modes.")
+    parser.add_argument("--audit", metavar="DIR", help="recursively audit DIR and stream JSONL to stdout")
+    parser.add_argument("--user", help="audit access for this user (default: current user)")
+    parser.add_argument("--all", action="store_true", help="write every entry, not only flagged ones")
+    parser.add_argument("-x", "--one-file-system", action="store_true", help="do not cross into other filesystems")
+    parser.add_argument("-j", "--jobs", type=int, default=16, help="directories scanned in parallel (default: 16)")
+    commands = parser.add_subparsers(dest="command")
+    snap = commands.add_parser("snapshot", help="record mode and ownership of everything under DIR")
+    snap.add_argument("directory")
+    snap.add_argument("-o", "--output", required=True, help="snapshot file to write")
+    snap.add_argument("-x", "--one-file-system", action="store_true", help="do not cross into other filesystems")
+    snap.add_argument("-j", "--jobs", type=int, default=16, help="directories scanned in parallel (default: 16)")
+    diff = commands.add_parser("diff", help="list entries added, removed or changed between two snapshots")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--jsonl", action="store_true", help="one JSON object per change")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        try:
+            count = writeSnapshot(args.directory, args.output, args.jobs, args.one_file_system)
+        except OSError as e:
+            sys.exit(f"cannot snapshot {args.directory}: {e.strerror}")
+        print(f"{count} entries written to {args.output}", file=sys.stderr)
+        return
+    if args.command == "diff":
+        try:
+            changes = printDiff(args.old, args.new, args.jsonl)
+        except (OSError, ValueError) as e:
+            sys.exit(f"cannot diff: {e}")
+        print(f"{changes} changes", file=sys.stderr)
+        return
+
+    if args.audit is None:
+        path = input("Enter the path to check: ").strip()
+        checkPermissions(path)
+        return
+
+    if pwd is None:
+        sys.exit("--audit needs POSIX user and group databases")
+    try:
+        written, scanned = auditTree(args.audit, args.user, args.jobs, args.all, args.one_file_system)
+    except KeyError:
+        sys.exit(f"unknown user: {args.user}")
+    except OSError as e:
+        sys.exit(f"cannot audit {args.audit}: {e.strerror}")
+    print(f"{scanned} directories scanned, {written} entries written", file=sys.stderr)
+
 if __name__ == "__main__":
-    path = input("Enter the path to check: ").strip()
-    checkPermissions(path)
+    main()
@@ -0,0 +1,266 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+import traceback
+import contextlib
+import multiprocessing
+from queue import Empty
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# depth and fan-out are per directory level; files_per_dir is per directory
+SCALES = {
+    'small':  dict(depth=3, fanout=4, files_per_dir=8),
+    'medium': dict(depth=4, fanout=5, files_per_dir=12),
+    'large':  dict(depth=5, fanout=6, files_per_dir=16),
+}
+
+EXTENSIONS = ['.py', '.js', '.c', '.go', '.html', '.txt', '.bin']
+IGNORED = ['node_modules', '.git', 'build', 'dist', '__pycache__']
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'return', 'if', 'for', 'value', 'result', 'index']
+COMMENT = {'.py': '#', '.js': '//', '.c': '//', '.go': '//', '.html': '<!--'}
+
+def make_content(rng, ext, size):
+    if ext == '.bin':
+        return rng.randbytes(size)
+    lines = []
+    total = 0
+    while total < size:
+        roll = rng.random()
+        if roll < 0.15:
+            line = ''
+        elif roll < 0.3 and ext in COMMENT:
+            line = f"{COMMENT[ext]} {' '.join(rng.choices(WORDS, k=6))}"
+        else:
+            line = '    ' * rng.randint(0, 3) + ' '.join(rng.choices(WORDS, k=rng.randint(2, 10)))
+        lines.append(line)
+        total += len(line) + 1
+    return ('\n'.join(lines) + '\n').encode()
+
+def generate_tree(root, depth=3, fanout=4, files_per_dir=8, size_mu=7.5, size_sigma=1.5,
+                  max_size=4 << 20, dup_ratio=0.1, empty_ratio=0.1, ignored_ratio=0.2, seed=0):
+    """Build a deterministic synthetic tree under root and return its counts.
+
+    File sizes follow a log-normal distribution (mu/sigma in ln-bytes, capped
+    at max_size). dup_ratio of files copy an earlier file's content,
+    empty_ratio of leaf directories are left empty, and ignored_ratio of
+    directories get an ignored child such as node_modules with its own files.
+    """
+    rng = random.Random(seed)
+    counts = dict(files=0, dirs=0, bytes=0, duplicates=0, empty_dirs=0)
+    contents = []
+
+    def write_files(path, n):
+        for i in range(n):
+            ext = rng.choice(EXTENSIONS)
+            if contents and rng.random() < dup_ratio:
+                data = rng.choice(contents)
+                counts['duplicates'] += 1
+            else:
+                size = min(int(rng.lognormvariate(size_mu, size_sigma)), max_size)
+                data = make_content(rng, ext, size)
+                if len(contents) < 256:
+                    contents.append(data)
+            with open(os.path.join(path, f"f{i}{ext}"), 'wb') as f:
+                f.write(data)
+            counts['files'] += 1
+            counts['bytes'] += len(data)
+
+    def build(path, level):
+        os.makedirs(path, exist_ok=True)
+        counts['dirs'] += 1
+        if level == depth:
+            if rng.random() < empty_ratio:
+                counts['empty_dirs'] += 1
+                return
+            write_files(path, files_per_dir)
+            return
+        write_files(path, files_per_dir // 2)
+        if rng.random() < ignored_ratio:
+            ignored = os.path.join(path, rng.choice(IGNORED), 'pkg')
+            os.makedirs(ignored, exist_ok=True)
+            counts['dirs'] += 2
+            write_files(ignored, files_per_dir)
+        for i in range(fanout):
+            build(os.path.join(path, f"d{i}"), level + 1)
+
+    build(root, 0)
+    return counts
+
+def iter_files(root):
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            yield os.path.join(dirpath, name)
+
+def evict(root):
+    """Drop the tree's file data from the page cache (directory entries stay cached)."""
+    for path in iter_files(root):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+def prime(root):
+    for path in iter_files(root):
+        with open(path, 'rb') as f:
+            while f.read(1 << 20):
+                pass
+
+def run_tool(tool, root):
+    sys.path.insert(0, HERE)
+    if tool == 'analyze_directory':
+        import project_analyzer
+        project_analyzer.analyze_directory(root, project_analyzer.DEFAULT_EXCLUDE)
+    elif tool == 'findDupes':
+        import duplicate_file_finder
+        duplicate_file_finder.findDupes(root)
+    elif tool == 'getFileList':
+        import recursive_file_search
+        recursive_file_search.getFileList(root)
+    elif tool == 'deleteEmptyFolders':
+        import remove_empty_directory
+        with mock.patch('builtins.input', return_value='yes'):
+            remove_empty_directory.deleteEmptyFolders(root)
+
+TOOLS = ['analyze_directory', 'findDupes', 'getFileList', 'deleteEmptyFolders']
+
+class MeasurementError(Exception):
+    pass
+
+def measure(tool, root, cold, queue):
+    """Child process body: time one tool run and report its wall time and peak RSS, or its traceback."""
+    try:
+        if cold:
+            evict(root)
+        else:
+            prime(root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run_tool(tool, root)
+            elapsed = time.perf_counter() - start
+    except BaseException:
+        queue.put(('error', traceback.format_exc()))
+        return
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(('ok', elapsed, rss if sys.platform != 'darwin' else rss // 1024))
+
+def run_once(tool, root, cold):
+    # a fresh interpreter per run keeps peak RSS specific to this tool
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=measure, args=(tool, root, cold, queue))
+    proc.start()
+    try:
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                if proc.is_alive():
+                    continue
+            # the child is gone; whatever it put before exiting is still readable
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Empty:
+                proc.join()
+                raise MeasurementError(f"child exited with code {proc.exitcode} before reporting")
+    finally:
+        proc.join()
+    if result[0] == 'error':
+        raise MeasurementError(result[1])
+    return result[1:]
+
+def git_revision():
+    try:
+        return subprocess.run(['git', '-C', HERE, 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark(scales, tools, workdir, repeat=3, seed=0, modes=('warm', 'cold')):
+    report = dict(revision=git_revision(), python=platform.python_version(),
+                  platform=platform.platform(), cpus=os.cpu_count(), seed=seed, results=[])
+    for scale in scales:
+        root = os.path.join(workdir, scale)
+        params = dict(SCALES[scale], seed=seed)
+        shutil.rmtree(root, ignore_errors=True)
+        counts = generate_tree(root, **params)
+        for tool in tools:
+            for mode in modes:
+                timings, peaks = [], []
+                try:
+                    for _ in range(repeat):
+                        if tool == 'deleteEmptyFolders':
+                            # the tool removes what it finds, so every run starts from a fresh tree
+                            shutil.rmtree(root)
+                            generate_tree(root, **params)
+                        elapsed, rss = run_once(tool, root, mode == 'cold')
+                        timings.append(elapsed)
+                        peaks.append(rss)
+                except MeasurementError as e:
+                    report['results'].append(dict(tool=tool, scale=scale, cache=mode, error=str(e)))
+                    print(f"{scale:<7} {tool:<20} {mode:<5} failed:\n{e}", file=sys.stderr)
+                    continue
+                seconds = statistics.median(timings)
+                report['results'].append(dict(
+                    tool=tool, scale=scale, cache=mode, files=counts['files'], bytes=counts['bytes'],
+                    seconds=round(seconds, 6), runs=[round(t, 6) for t in timings],
+                    files_per_sec=round(counts['files'] / seconds, 1) if seconds else None,
+                    peak_rss_kb=max(peaks)))
+                print(f"{scale:<7} {tool:<20} {mode:<5} {seconds:8.3f}s "
+                      f"{counts['files'] / seconds:>12.0f} files/s {max(peaks):>9} KiB", file=sys.stderr)
+        shutil.rmtree(root, ignore_errors=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the filesystem tools on synthetic trees")
+    parser.add_argument('--scales', default='small,medium', help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument('--tools', default=','.join(TOOLS), help="comma-separated tool functions to time")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the tree generator")
+    parser.add_argument('--workdir', help="where trees are generated (default: a temp dir)")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--generate', metavar='DIR', help="only generate a tree (first scale) into DIR and exit")
+    args = parser.parse_args()
+
+    scales = args.scales.split(',')
+    tools = args.tools.split(',')
+    for name in scales:
+        if name not in SCALES:
+            sys.exit(f"unknown scale: {name}")
+    for name in tools:
+        if name not in TOOLS:
+            sys.exit(f"unknown tool: {name}")
+
+    if args.generate:
+        print(json.dumps(generate_tree(args.generate, **SCALES[scales[0]], seed=args.seed)))
+        return
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        report = benchmark(scales, tools, workdir, args.repeat, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
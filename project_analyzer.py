@@ -1,31 +1,61 @@
 import os
+import re
 import sys
+import json
+import hashlib
 import argparse
+import subprocess
+from itertools import islice
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+C_STRINGS = rb'"(?:[^"\\\n]++|\\.)*+"|' + rb"'(?:[^'\\\n]++|\\.)*+'"
+C_BLOCK = {b'/*': (b'*/', 'block', False)}
+# one character, UTF-8 sequence or escape between quotes, so lifetimes like 'a stay untouched
+RUST_CHARS = rb"'(?:[^'\\\n\x80-\xff]|[\xc0-\xff][\x80-\xbf]{1,3}|\\(?:u\{[0-9a-fA-F]{1,6}\}|x[0-9a-fA-F]{2}|[^\n]))'"
+
+# Per syntax: the line comment token, and each multi-line span keyed by its
+# opener as (closer, kind, backslash escapes). 'block' spans are comments,
+# 'doc' spans are comments only when they open their line and 'multiline'
+# spans are always code. One-line strings are only tokenized so that openers
+# inside them are ignored.
+SYNTAX_RULES = {
+    'c':      dict(line=b'//', spans=C_BLOCK, strings=C_STRINGS),
+    'js':     dict(line=b'//', spans={**C_BLOCK, b'`': (b'`', 'multiline', True)}, strings=C_STRINGS),
+    'go':     dict(line=b'//', spans={**C_BLOCK, b'`': (b'`', 'multiline', False)}, strings=C_STRINGS),
+    'rust':   dict(line=b'//', spans={**C_BLOCK, b'"': (b'"', 'multiline', True)}, strings=RUST_CHARS),
+    'kotlin': dict(line=b'//', spans={**C_BLOCK, b'"""': (b'"""', 'multiline', True),
+                                      b"'''": (b"'''", 'multiline', True)}, strings=C_STRINGS),
+    'python': dict(line=b'#', spans={b'"""': (b'"""', 'doc', True), b"'''": (b"'''", 'doc', True)},
+                   strings=C_STRINGS),
+    'shell':  dict(line=b'#'),
+    'markup': dict(spans={b'<!--': (b'-->', 'block', False)}),
+    'css':    dict(spans=C_BLOCK, strings=C_STRINGS),
+}
 
 LANGUAGE_MAP = {
-    '.py':  ('Python', '#'),
-    '.js':  ('JavaScript', '//'),
-    '.jsx': ('React JSX', '//'),
-    '.ts':  ('TypeScript', '//'),
-    '.tsx': ('React TSX', '//'),
-    '.java': ('Java', '//'),
-    '.kt':  ('Kotlin', '//'),
-    '.c':   ('C', '//'),
-    '.cpp': ('C++', '//'),
-    '.h':   ('C/C++ Header', '//'),
-    '.go':  ('Go', '//'),
-    '.rs':  ('Rust', '//'),
-    '.dart': ('Flutter (Dart)', '//'),
-    '.html': ('HTML', '<!--'),
-    '.css':  ('CSS', '/*'),
-    '.sh':   ('Shell', '#'),
-    '.bash': ('Shell', '#'),
-    '.zsh':  ('Shell', '#'),
-    '.xml':  ('Android XML', '<!--'),
-    '.bashrc': ('Shell Config', '#'),
-    '.zshrc':  ('Shell Config', '#'),
-    '.profile': ('Shell Config', '#'),
+    '.py':  ('Python', 'python'),
+    '.js':  ('JavaScript', 'js'),
+    '.jsx': ('React JSX', 'js'),
+    '.ts':  ('TypeScript', 'js'),
+    '.tsx': ('React TSX', 'js'),
+    '.java': ('Java', 'c'),
+    '.kt':  ('Kotlin', 'kotlin'),
+    '.c':   ('C', 'c'),
+    '.cpp': ('C++', 'c'),
+    '.h':   ('C/C++ Header', 'c'),
+    '.go':  ('Go', 'go'),
+    '.rs':  ('Rust', 'rust'),
+    '.dart': ('Flutter (Dart)', 'kotlin'),
+    '.html': ('HTML', 'markup'),
+    '.css':  ('CSS', 'css'),
+    '.sh':   ('Shell', 'shell'),
+    '.bash': ('Shell', 'shell'),
+    '.zsh':  ('Shell', 'shell'),
+    '.xml':  ('Android XML', 'markup'),
+    '.bashrc': ('Shell Config', 'shell'),
+    '.zshrc':  ('Shell Config', 'shell'),
+    '.profile': ('Shell Config', 'shell'),
 }
 
 DEFAULT_EXCLUDE = {
@@ -33,6 +63,67 @@ DEFAULT_EXCLUDE = {
     '.dart_tool', '.idea', '.vscode', '__pycache__', 'out'
 }
 
+CACHE_VERSION = 3  # bump whenever analyze_file would count a file differently
+
+BINARY_SNIFF = 8192  # a NUL byte in this many leading bytes marks the file as binary
+
+WS = rb'[ \t\r\f\v]*+'
+LINE_END = rb'(?![^\n])'  # at a newline or the end of the buffer
+
+def span_body(closer, escapes, multiline=False):
+    """Regex for what may sit between an opener and closer, on one line unless multiline."""
+    head, rest = re.escape(closer[:1]), re.escape(closer[1:])
+    stop = rb'\\' if escapes else b''
+    body = [b'[^' + head + stop + (b'' if multiline else rb'\n') + b']++']
+    if escapes:
+        body.append(rb'\\[\s\S]?' if multiline else rb'\\[^\n]')
+    if rest:
+        body.append(head + b'(?!' + rest + b')')
+    return b'(?:' + b'|'.join(body) + b')*+'
+
+def compile_syntax(line=None, spans=None, strings=None):
+    """Build (comment-line regex, the same anchored at a line start, span kinds, span finders, span scanner).
+
+    A comment line holds only a line comment, or a block comment or
+    docstring that closes on the line, optionally followed by a line comment.
+    The comment-line regex also matches blank lines with an empty group, so
+    one pass over the newlines counts both.
+
+    Each span finder matches its opener only when the span runs past the end
+    of the line, since one-line spans never change how lines are counted. A
+    literal prefix lets the regex engine jump between openers like bytes.find.
+    Finders can't tell an opener inside a string or comment from a real one,
+    so they only pick the line to start the span scanner from. Each scanner
+    match skips plain text, strings, line comments and one-line spans, and
+    ends with the next span that runs past its line (one group per opener) or
+    at the end of the buffer.
+    """
+    spans = spans or {}
+    line_comment = re.escape(line) if line else None
+    comments = [line_comment] if line else []
+    for opener, (closer, kind, escapes) in spans.items():
+        if kind in ('block', 'doc'):
+            comments.append((rb'[rRbBuU]{0,2}' if kind == 'doc' else b'') + re.escape(opener) + span_body(closer, escapes)
+                            + re.escape(closer) + WS + b'(?:' + b'|'.join(([line_comment] if line else []) + [LINE_END]) + b')')
+    comment = b'|'.join(comments)
+    line_re = re.compile(rb'\n' + WS + b'(?:(' + comment + rb')|(?=\n))') if comments else None
+    line_start = re.compile(WS + b'(?:' + comment + b')') if comments else None
+    if not spans:
+        return line_re, line_start, None, None, None
+
+    openers = b'|'.join(map(re.escape, spans))
+    one_line = [re.escape(o) + span_body(c, e) + re.escape(c) for o, (c, _, e) in spans.items()]
+    tokens = [rx for rx in (strings, line_comment and line_comment + rb'[^\n]*+') if rx]
+    firsts = {rx[:1] for rx in spans} | ({line[:1]} if line else set()) | ({b'"', b"'"} if strings else set())
+    plain = b'[^' + b''.join(re.escape(c) for c in sorted(firsts)) + b']++'
+    skip = b'|'.join([plain, *one_line, b'(?!' + openers + b')(?:' + b'|'.join(tokens + [rb'[\s\S]']) + b')'])
+    multi = [b'(' + re.escape(o) + span_body(c, e, True) + b'(?:' + re.escape(c) + rb'|\Z))' for o, (c, _, e) in spans.items()]
+    scanner = re.compile(b'(?:' + skip + b')*+(?:' + b'|'.join(multi) + rb'|\Z)')
+    finders = [re.compile(re.escape(o) + span_body(c, e) + rb'(?=\\?\n|\Z)') for o, (c, _, e) in spans.items()]
+    return line_re, line_start, [kind for _, kind, _ in spans.values()], finders, scanner
+
+SYNTAXES = {name: compile_syntax(**rules) for name, rules in SYNTAX_RULES.items()}
+
 class Stats:
     def __init__(self):
         self.files = 0
@@ -47,38 +138,359 @@ class Stats:
         self.blanks += other.blanks
         return self
 
-def analyze_file(filepath, comment_token):
+    def __isub__(self, other):
+        self.files -= other.files
+        self.code -= other.code
+        self.comments -= other.comments
+        self.blanks -= other.blanks
+        return self
+
+class ResultCache:
+    """Per-file Stats from earlier runs, reused while a file's size and mtime_ns are unchanged.
+
+    Stats for git blobs are kept alongside, keyed by blob SHA and syntax, since
+    their content can never change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.seen = {}
+        self.blobs = {}
+        self.seen_blobs = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data["files"]
+                self.blobs = data.get("blobs", {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, filepath, st):
+        entry = self.entries.get(filepath)
+        if not entry or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+            return None
+        self.seen[filepath] = entry
+        stats = Stats()
+        stats.files, stats.code, stats.comments, stats.blanks = entry[2:]
+        return stats
+
+    def put(self, filepath, st, stats):
+        self.seen[filepath] = [st.st_size, st.st_mtime_ns, stats.files, stats.code, stats.comments, stats.blanks]
+
+    def get_blob(self, sha, syntax):
+        entry = self.blobs.get(f"{sha}:{syntax}")
+        if not entry:
+            return None
+        self.seen_blobs[f"{sha}:{syntax}"] = entry
+        stats = Stats()
+        stats.files, stats.code, stats.comments, stats.blanks = entry
+        return stats
+
+    def put_blob(self, sha, syntax, stats):
+        self.seen_blobs[f"{sha}:{syntax}"] = [stats.files, stats.code, stats.comments, stats.blanks]
+
+    def save(self, prune_files=True, prune_blobs=False):
+        # pruned sections keep only what this run used, so deleted files drop out
+        files = self.seen if prune_files else {**self.entries, **self.seen}
+        blobs = self.seen_blobs if prune_blobs else {**self.blobs, **self.seen_blobs}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": CACHE_VERSION, "files": files, "blobs": blobs},
+                      f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+def default_cache_path(project_path):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    key = hashlib.sha1(project_path.encode()).hexdigest()[:16]
+    return os.path.join(base, "project_analyzer", f"{key}.json")
+
+def tally(data, start, end, line_re, line_start):
+    """(lines, blanks, comment lines) among the whole lines in data[start:end]."""
+    if start >= end:
+        return 0, 0, 0
+    lines = data.count(b'\n', start, end)
+    found = line_re.findall(data, start, end)
+    blanks = found.count(b'')
+    comments = len(found) - blanks
+    # line_re needs a newline before the line, and a blank line one after it too,
+    # so the first line and an unterminated last line are checked by hand
+    newline = data.find(b'\n', start, end)
+    if not data[start:end if newline == -1 else newline].strip():
+        blanks += 1
+    elif line_start.match(data, start, end):
+        comments += 1
+    if data[end - 1] != 10:
+        lines += 1
+        if newline != -1 and not data[data.rfind(b'\n', start, end) + 1:end].strip():
+            blanks += 1
+    return lines, blanks, comments
+
+def find_spans(data, syntax):
+    """Yield (kind, start, end) for each span that runs past the line it opens on.
+
+    Strings and comments can't run across lines, so any line start outside
+    a span is a safe place to start scanning. The scanner is started at the
+    line of the next candidate opener and walks on from there to the next
+    real span, so no byte is scanned twice and stretches without a candidate
+    are left to the finders.
+    """
+    kinds, finders, scanner = syntax[2:]
+    found = [finder.search(data) for finder in finders]
+    pos = 0
+    while True:
+        for i, match in enumerate(found):
+            if match and match.start() < pos:
+                found[i] = match = finders[i].search(data, pos)
+        starts = [match.start() for match in found if match]
+        if not starts:
+            return
+        match = scanner.match(data, max(data.rfind(b'\n', 0, min(starts)) + 1, pos))
+        if not match.lastindex:
+            return
+        yield kinds[match.lastindex - 1], *match.span(match.lastindex)
+        pos = match.end()
+
+def classify_lines(data, syntax):
+    """[code, comments, blanks] for a raw source buffer.
+
+    Lines are counted in bulk first, with one-line block comments and
+    docstrings recognised by the comment-line regex. Spans that cross lines
+    are then located and only the lines they cover are corrected. The line
+    a span opens on was always counted as code, since a comment line cannot
+    leave a span open.
+
+    This is about correct counts, not speed: it runs at roughly 0.6x the
+    old str.strip()/startswith() line loop on Python sources, and slower
+    on files dense with multi-line spans.
+    """
+    line_re, line_start, kinds = syntax[:3]
+    lines, blanks, comments = tally(data, 0, len(data), line_re, line_start)
+    code = lines - blanks - comments
+    if kinds is None:
+        return [code, comments, blanks]
+
+    fixed = -1  # start of the last line already reclassified
+    for kind, start, end in find_spans(data, syntax):
+        if data[end - 1] == 10:
+            end -= 1  # unterminated span that ran to the end of the file
+        first = data.rfind(b'\n', 0, start) + 1
+        last = data.rfind(b'\n', start, end) + 1 or first
+        last_end = data.find(b'\n', end)
+        if last_end == -1:
+            last_end = len(data)
+        # a docstring may carry string prefixes such as r or b before its quotes
+        opens_line = not data[first:start].strip().rstrip(b'rRbBuU' if kind == 'doc' else b'')
+        closes_line = not data[end:last_end].strip() or bool(line_start.match(data, end, last_end))
+        is_comment = kind == 'block' or (kind == 'doc' and opens_line)
+
+        if first != fixed and is_comment and opens_line and (last != first or closes_line):
+            code -= 1
+            comments += 1
+        if last == first:
+            # only an unterminated span on the last line gets here
+            fixed = first
+            continue
+        # the lines strictly inside the span; each follows a newline, so
+        # line_re alone classifies them
+        first_end = data.find(b'\n', start)
+        if first_end + 1 < last:
+            found = line_re.findall(data, first_end, last)
+            inner_comments = len(found) - found.count(b'')
+            if is_comment:
+                inner_code = data.count(b'\n', first_end + 1, last) - len(found)
+                code -= inner_code
+                comments += inner_code
+            else:
+                code += inner_comments
+                comments -= inner_comments
+        was_comment = bool(line_start.match(data, last, last_end))
+        if is_comment and closes_line and not was_comment:
+            code -= 1
+            comments += 1
+        elif was_comment and not (is_comment and closes_line):
+            code += 1
+            comments -= 1
+        fixed = last
+    return [code, comments, blanks]
+
+def analyze_bytes(data, syntax):
     stats = Stats()
+    if b'\0' in data[:BINARY_SNIFF]:
+        return stats
     stats.files = 1
+    stats.code, stats.comments, stats.blanks = classify_lines(data, SYNTAXES[syntax])
+    return stats
+
+def analyze_file(filepath, syntax):
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    stats.blanks += 1
-                elif line.startswith(comment_token):
-                    stats.comments += 1
-                else:
-                    stats.code += 1
+        # read whole: a span can cross any chunk boundary, and the span
+        # scanner needs the line it starts on
+        with open(filepath, 'rb') as f:
+            data = f.read()
     except Exception as e:
         print(f"Error reading {filepath}: {e}")
-    return stats
+        stats = Stats()
+        stats.files = 1
+        return stats
+    return analyze_bytes(data, syntax)
 
-def analyze_directory(path, exclude):
-    total = defaultdict(Stats)
+def detect_language(filename):
+    ext = os.path.splitext(filename)[1]
+    if not ext and filename in LANGUAGE_MAP:
+        return LANGUAGE_MAP[filename]
+    return LANGUAGE_MAP.get(ext)
+
+def iter_source_files(path, exclude):
     for root, dirs, files in os.walk(path):
         dirs[:] = [d for d in dirs if d not in exclude]
         for file in files:
-            ext = os.path.splitext(file)[1]
-            if not ext and file in LANGUAGE_MAP:
-                lang, comment_token = LANGUAGE_MAP[file]
-            elif ext in LANGUAGE_MAP:
-                lang, comment_token = LANGUAGE_MAP[ext]
-            else:
+            detected = detect_language(file)
+            if detected:
+                yield os.path.join(root, file), *detected
+
+def analyze_batch(batch):
+    return [(filepath, lang, analyze_file(filepath, syntax))
+            for filepath, lang, syntax in batch]
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def analyze_directory(path, exclude, jobs=1, batch_size=256, cache=None):
+    total = defaultdict(Stats)
+    todo = []
+    stats_by_path = {}
+    for filepath, lang, syntax in iter_source_files(path, exclude):
+        if cache is not None:
+            try:
+                st = os.stat(filepath)
+            except OSError:
                 continue
-            filepath = os.path.join(root, file)
-            stats = analyze_file(filepath, comment_token)
+            hit = cache.get(filepath, st)
+            if hit:
+                if hit.files:
+                    total[lang] += hit
+                continue
+            stats_by_path[filepath] = st
+        todo.append((filepath, lang, syntax))
+
+    for filepath, lang, stats in run_batches(todo, jobs, batch_size):
+        if stats.files:  # binary files are skipped, not counted
             total[lang] += stats
+        if cache is not None:
+            cache.put(filepath, stats_by_path[filepath], stats)
+    if cache is not None:
+        cache.save()
+    return total
+
+def run_batches(todo, jobs, batch_size):
+    if jobs == 1:
+        return analyze_batch(todo)
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        return [result for partial in pool.map(analyze_batch, batched(todo, batch_size))
+                for result in partial]
+
+def git(path, *args, stdin=None):
+    return subprocess.run(["git", "-C", path, *args], input=stdin,
+                          stdout=subprocess.PIPE, check=True).stdout
+
+def iter_git_files(path):
+    """Yield (filepath, lang, syntax, index blob SHA or None when the worktree copy differs)."""
+    dirty = set(git(path, "ls-files", "-z", "-m").split(b"\0"))
+    deleted = set(git(path, "ls-files", "-z", "-d").split(b"\0"))
+    for entry in git(path, "ls-files", "-z", "-s").split(b"\0"):
+        if not entry:
+            continue
+        info, name = entry.split(b"\t", 1)
+        mode, sha, stage = info.split()
+        if mode == b"160000" or stage not in (b"0", b"1") or name in deleted:
+            continue  # submodules, the extra stages of a conflict, files gone from disk
+        filename = os.fsdecode(name)
+        detected = detect_language(os.path.basename(filename))
+        if detected:
+            yield os.path.join(path, filename), *detected, None if name in dirty else sha.decode()
+
+def analyze_git(path, jobs=1, batch_size=256, cache=None):
+    """Like analyze_directory, but over tracked files, analyzing each distinct blob once."""
+    total = defaultdict(Stats)
+    todo = []
+    waiting = defaultdict(list)  # (sha, syntax) -> languages of further files with that blob
+    keys = {}
+    for filepath, lang, syntax, sha in iter_git_files(path):
+        if sha:
+            hit = cache.get_blob(sha, syntax) if cache is not None else None
+            if hit:
+                if hit.files:
+                    total[lang] += hit
+                continue
+            if (sha, syntax) in waiting:
+                waiting[sha, syntax].append(lang)
+                continue
+            waiting[sha, syntax] = []
+            keys[filepath] = sha, syntax
+        todo.append((filepath, lang, syntax))
+
+    for filepath, lang, stats in run_batches(todo, jobs, batch_size):
+        key = keys.get(filepath)
+        for each in [lang] + (waiting[key] if key else []):
+            if stats.files:
+                total[each] += stats
+        if key and cache is not None:
+            cache.put_blob(*key, stats)
+    if cache is not None:
+        cache.save(prune_files=False, prune_blobs=True)
+    return total
+
+def read_blobs(path, shas):
+    """Map each SHA to its blob content using a single `git cat-file --batch` call."""
+    out = git(path, "cat-file", "--batch", stdin=b"".join(sha.encode() + b"\n" for sha in shas))
+    blobs, pos = {}, 0
+    while pos < len(out):
+        header_end = out.index(b"\n", pos)
+        sha, _, size = out[pos:header_end].split()
+        start = header_end + 1
+        blobs[sha.decode()] = out[start:start + int(size)]
+        pos = start + int(size) + 1
+    return blobs
+
+def diff_git(path, since, until="HEAD", cache=None):
+    """Per-language Stats deltas from `since` to `until`, reading only the blobs that changed."""
+    out = git(path, "diff-tree", "-r", "-z", "--no-renames", "--relative", since, until)
+    fields = out.split(b"\0")
+    changes = []
+    for info, name in zip(fields[0::2], fields[1::2]):
+        old_mode, new_mode, old_sha, new_sha, _ = info[1:].decode().split()
+        detected = detect_language(os.path.basename(os.fsdecode(name)))
+        if not detected:
+            continue
+        lang, syntax = detected
+        for mode, sha, sign in ((old_mode, old_sha, -1), (new_mode, new_sha, 1)):
+            if mode not in ("000000", "160000"):
+                changes.append((lang, syntax, sha, sign))
+
+    stats_by_key = {}
+    for _, syntax, sha, _ in changes:
+        hit = cache.get_blob(sha, syntax) if cache is not None else None
+        if hit:
+            stats_by_key[sha, syntax] = hit
+    missing = {sha for _, syntax, sha, _ in changes if (sha, syntax) not in stats_by_key}
+    blobs = read_blobs(path, missing) if missing else {}
+    total = defaultdict(Stats)
+    for lang, syntax, sha, sign in changes:
+        if (sha, syntax) not in stats_by_key:
+            stats_by_key[sha, syntax] = analyze_bytes(blobs[sha], syntax)
+            if cache is not None:
+                cache.put_blob(sha, syntax, stats_by_key[sha, syntax])
+        if sign > 0:
+            total[lang] += stats_by_key[sha, syntax]
+        else:
+            total[lang] -= stats_by_key[sha, syntax]
+    if cache is not None:
+        cache.save(prune_files=False)
     return total
 
 def print_summary(results):
@@ -116,16 +528,46 @@ def print_summary(results):
     print(f" > Average LOC per file: {avg_loc_per_file:.2f}")
     print(f" > Most used language: {most_used_lang or 'N/A'} ({max_code} LOC)")
 
+def print_delta(results, since, until):
+    print(f"\nChanges {since}..{until}:")
+    print("-" * 60)
+    print(f"{'Language':<20} {'Files':>6} {'Code':>8} {'Comments':>10} {'Blanks':>8}")
+    print("-" * 60)
+    total = Stats()
+    for lang, stat in sorted(results.items()):
+        print(f"{lang:<20} {stat.files:>+6} {stat.code:>+8} {stat.comments:>+10} {stat.blanks:>+8}")
+        total += stat
+    print("-" * 60)
+    print(f"{'TOTAL':<20} {total.files:>+6} {total.code:>+8} {total.comments:>+10} {total.blanks:>+8}")
+    print("-" * 60)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Tokei-style project analyzer in Python")
     parser.add_argument("path", nargs="?", default=".", help="Path to the project root")
     parser.add_argument("--exclude", nargs="*", help="Directories to exclude (space-separated)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--cache", help="Per-file results cache (default: under $XDG_CACHE_HOME)")
+    parser.add_argument("--no-cache", action="store_true", help="Re-read every file and leave the cache alone")
+    parser.add_argument("--git", action="store_true", help="Analyze the files git tracks instead of walking the tree")
+    parser.add_argument("--since", metavar="REV", help="Report LOC changes by language from REV to --until")
+    parser.add_argument("--until", metavar="REV", default="HEAD", help="End revision for --since (default: HEAD)")
     args = parser.parse_args()
     project_path = os.path.abspath(args.path)
-    user_exclude = set(args.exclude) if args.exclude else set()
-    all_exclude = DEFAULT_EXCLUDE.union(user_exclude)
-    print(f" > Analyzing: {project_path}")
-    print(f" > Excluding: {', '.join(sorted(all_exclude))}")
-    print("\n")
-    results = analyze_directory(project_path, all_exclude)
-    print_summary(results)
+    cache = None if args.no_cache else ResultCache(args.cache or default_cache_path(project_path))
+    try:
+        if args.since:
+            print(f" > Analyzing: {project_path} ({args.since}..{args.until})")
+            print_delta(diff_git(project_path, args.since, args.until, cache), args.since, args.until)
+        elif args.git:
+            print(f" > Analyzing: {project_path} (git tracked files)")
+            print("\n")
+            print_summary(analyze_git(project_path, args.jobs, cache=cache))
+        else:
+            user_exclude = set(args.exclude) if args.exclude else set()
+            all_exclude = DEFAULT_EXCLUDE.union(user_exclude)
+            print(f" > Analyzing: {project_path}")
+            print(f" > Excluding: {', '.join(sorted(all_exclude))}")
+            print("\n")
+            print_summary(analyze_directory(project_path, all_exclude, args.jobs, cache=cache))
+    except subprocess.CalledProcessError as e:
+        sys.exit(f"git failed: {e}")
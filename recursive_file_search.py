@@ -1,56 +1,527 @@
+import re
 import subprocess
 import argparse
 from pathlib import Path
 import sys
 import os
 import shutil
+import mmap
+import heapq
+import struct
+import marshal
+import hashlib
+import threading
+import itertools
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+try:
+    from rapidfuzz import process as fuzzProcess, fuzz
+except ImportError:
+    fuzzProcess = None
 
 
 IGNORED_DIRS = {'.git', '__pycache__', 'node_modules', 'build', 'dist'}
+IGNORE_FILES = ('.gitignore', '.ignore')
+INDEX_VERSION = 2
+BLOCK_SIZE = 64                # paths per block; trigrams point at blocks
+INDEX_MAGIC = b'RFSIDX02'
+INDEX_HEADER = struct.Struct('<8sIIII') # magic, paths, blocks, trigrams, postings
+BLOCK_SPAN = struct.Struct('<QQ')       # a block's start and end in the data area
+GRAM = struct.Struct('<3sxII')          # trigram, first posting, posting count
+
+def globToRegex(glob):
+    """Translate one gitignore glob (already stripped of '!' and trailing '/') to a regex."""
+    anchored = '/' in glob
+    glob = glob.lstrip('/')
+    out, i = [], 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            end = glob.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                out.append('[' + ('^' + body[1:] if body[0] in '!^' else body) + ']')
+                i = end
+        elif c == '\\' and i + 1 < len(glob):
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    # unanchored patterns match at any depth below the ignore file
+    return re.compile(('' if anchored else '(?:.*/)?') + ''.join(out) + '$')
+
+def loadIgnoreRules(dirPath):
+    """Compile the .gitignore/.ignore files in dirPath into (regex, negate, dirOnly) rules."""
+    rules = []
+    for name in IGNORE_FILES:
+        try:
+            with open(os.path.join(dirPath, name), encoding='utf-8', errors='ignore') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate or line.startswith('\\!') or line.startswith('\\#'):
+                line = line[1:]
+            dirOnly = line.endswith('/')
+            line = line.rstrip('/')
+            if line:
+                rules.append((globToRegex(line), negate, dirOnly))
+    return rules
 
-def getFileList(rootDir, extension=None):
-    files = []
-    for path in Path(rootDir).rglob('*'):
-        if not path.is_file():
+def isIgnored(path, isDir, matchers):
+    # deeper ignore files override shallower ones, and later rules override earlier ones
+    for prefixLen, rules in reversed(matchers):
+        rel = path[prefixLen:].replace(os.sep, '/')
+        for regex, negate, dirOnly in reversed(rules):
+            if (isDir or not dirOnly) and regex.match(rel):
+                return not negate
+    return False
+
+def walkFiles(rootDir, extension=None, useIgnoreFiles=True):
+    """Yield file paths under rootDir, never descending into ignored directories."""
+    root = str(Path(rootDir))
+    stack = [(root, ())]
+    while stack:
+        dirPath, matchers = stack.pop()
+        if useIgnoreFiles:
+            rules = loadIgnoreRules(dirPath)
+            if rules:
+                # rules match paths relative to dirPath: strip dirPath and its separator,
+                # which join only adds when missing, so a root of '/' strips one character
+                matchers = matchers + ((0 if dirPath == '.' else len(os.path.join(dirPath, '')), rules),)
+        try:
+            entries = os.scandir(dirPath)
+        except OSError:
             continue
-        if any(ignored in path.parts for ignored in IGNORED_DIRS):
+        with entries:
+            for entry in entries:
+                path = entry.name if dirPath == '.' else os.path.join(dirPath, entry.name)
+                isDir = entry.is_dir(follow_symlinks=False)
+                if isDir and entry.name in IGNORED_DIRS:
+                    continue
+                if matchers and isIgnored(path, isDir, matchers):
+                    continue
+                if isDir:
+                    stack.append((path, matchers))
+                elif entry.is_file() and not (extension and not entry.name.endswith(extension)):
+                    yield path
+
+def getFileList(rootDir, extension=None, useIgnoreFiles=True):
+    return list(walkFiles(rootDir, extension, useIgnoreFiles))
+
+def indexFiles(rootDir):
+    """(index, directory table) file paths for rootDir under the XDG cache dir."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    key = hashlib.sha1(os.path.abspath(rootDir).encode()).hexdigest()[:16]
+    stem = os.path.join(base, 'recursive_file_search', key)
+    return stem + '.idx', stem + '.dirs'
+
+def ignoreSignature(dirPath):
+    sig = []
+    for name in IGNORE_FILES:
+        try:
+            sig.append(os.stat(os.path.join(dirPath, name)).st_mtime_ns)
+        except OSError:
+            sig.append(0)
+    return tuple(sig)
+
+def scanTree(root, oldDirs, useIgnoreFiles=True):
+    """Return {relDir: (mtime_ns, ignoreSig, files, subdirs)}, listing only changed directories.
+
+    A directory whose mtime and ignore files are unchanged still has the same
+    entries, so its previous record is reused without a scandir.
+    """
+    dirs = {}
+    stack = [('', (), False)]
+    while stack:
+        rel, matchers, forced = stack.pop()
+        dirPath = os.path.join(root, rel)
+        try:
+            mtime = os.stat(dirPath).st_mtime_ns
+        except OSError:
+            continue
+        sig = ignoreSignature(dirPath) if useIgnoreFiles else ()
+        if any(sig):
+            matchers = matchers + ((len(os.path.join(dirPath, '')), loadIgnoreRules(dirPath)),)
+        old = oldDirs.get(rel)
+        if old and old[1] != sig:
+            forced = True  # changed rules can hide or reveal anything below here
+        if old and not forced and old[0] == mtime:
+            files, subdirs = old[2], old[3]
+        else:
+            files, subdirs = [], []
+            try:
+                entries = os.scandir(dirPath)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    isDir = entry.is_dir(follow_symlinks=False)
+                    if isDir and entry.name in IGNORED_DIRS:
+                        continue
+                    if matchers and isIgnored(entry.path, isDir, matchers):
+                        continue
+                    if isDir:
+                        subdirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+        dirs[rel] = (mtime, sig, files, subdirs)
+        for name in subdirs:
+            stack.append((f"{rel}/{name}" if rel else name, matchers, forced))
+    return dirs
+
+def buildIndex(dirs):
+    """Sorted blocks of NUL-separated paths plus a trigram -> block ids index.
+
+    Trigrams are taken from each lowered path with two NULs appended, so a
+    one- or two-byte term at the end of a name still has trigrams starting
+    with it.
+    """
+    paths = sorted(os.fsencode(f"{rel}/{name}" if rel else name)
+                   for rel, record in dirs.items() for name in record[2])
+    blocks, postings = [], defaultdict(list)
+    for blockId, start in enumerate(range(0, len(paths), BLOCK_SIZE)):
+        chunk, grams, prev = paths[start:start + BLOCK_SIZE], set(), b''
+        for path in chunk:
+            # trigrams wholly inside the prefix shared with prev were already taken from it
+            text = path[max(0, len(os.path.commonprefix([prev, path])) - 2):].lower() + b'\0\0'
+            grams.update(text[i:i + 3] for i in range(len(text) - 2))
+            prev = path
+        blocks.append(b'\0'.join(chunk))
+        for gram in grams:
+            postings[gram].append(blockId)
+    return {'count': len(paths), 'blocks': blocks, 'trigrams': dict(sorted(postings.items()))}
+
+def writeIndex(path, index):
+    """Write the index in a layout queryIndex can read through mmap, touching only what a query needs.
+
+    Header, then a start/end pair per block, the trigram table sorted by
+    trigram, the block id postings, and last the blocks themselves.
+    """
+    blocks, trigrams = index['blocks'], index['trigrams']
+    spans, pos = bytearray(), 0
+    for block in blocks:
+        spans += BLOCK_SPAN.pack(pos, pos + len(block))
+        pos += len(block)
+    table, ids = bytearray(), array('I')
+    for gram, blockIds in trigrams.items():
+        table += GRAM.pack(gram, len(ids), len(blockIds))
+        ids.extend(blockIds)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, index['count'], len(blocks), len(trigrams), len(ids)))
+        f.write(spans)
+        f.write(table)
+        ids.tofile(f)
+        for block in blocks:
+            f.write(block)
+    os.replace(path + '.tmp', path)
+
+def indexCurrent(path):
+    """Whether path holds an index in the layout this version reads."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+    except OSError:
+        return False
+
+def writeMarshal(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        marshal.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+def updateIndex(rootDir, useIgnoreFiles=True):
+    indexFile, dirsFile = indexFiles(rootDir)
+    oldDirs = {}
+    try:
+        with open(dirsFile, 'rb') as f:
+            saved = marshal.load(f)
+        if saved.get('version') == INDEX_VERSION and saved.get('ignore') == useIgnoreFiles:
+            oldDirs = saved['dirs']
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    dirs = scanTree(os.path.abspath(rootDir), oldDirs, useIgnoreFiles)
+    writeIndex(indexFile, buildIndex(dirs))
+    writeMarshal(dirsFile, {'version': INDEX_VERSION, 'ignore': useIgnoreFiles, 'dirs': dirs})
+
+def rankMatches(query, matches, limit):
+    """The best limit of matches, given as bytes and returned decoded."""
+    if fuzzProcess:
+        return [match for match, _, _ in fuzzProcess.extract(query, [os.fsdecode(m) for m in matches],
+                                                             scorer=fuzz.WRatio, limit=limit)]
+    terms = [os.fsencode(term) for term in query.lower().split()]
+
+    def score(path):
+        name = path[path.rfind(b'/') + 1:].lower()
+        return -sum(term in name for term in terms), len(path), path
+    return [os.fsdecode(match) for match in heapq.nsmallest(limit, matches, key=score)]
+
+def queryIndex(rootDir, query, limit=20):
+    """Paths containing every whitespace-separated term of query, best first.
+
+    The index is mapped, not loaded: a query binary-searches the trigram
+    table, reads the postings of its own trigrams, and only then the blocks
+    they point at. A block is split into paths only if it contains every
+    term.
+    """
+    with open(indexFiles(rootDir)[0], 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+        magic, _, blockCount, gramCount, idCount = INDEX_HEADER.unpack_from(index)
+        if magic != INDEX_MAGIC:
+            raise ValueError("index was written by another version; run --update-index")
+        spansAt = INDEX_HEADER.size
+        tableAt = spansAt + blockCount * BLOCK_SPAN.size
+        idsAt = tableAt + gramCount * GRAM.size
+        dataAt = idsAt + idCount * 4
+
+        def firstGram(key):
+            lo, hi = 0, gramCount
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if GRAM.unpack_from(index, tableAt + mid * GRAM.size)[0] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+
+        def blocksWith(prefix):
+            # every trigram starting with prefix sits in one run of the sorted table
+            ids = set()
+            for i in range(firstGram(prefix), gramCount):
+                gram, first, count = GRAM.unpack_from(index, tableAt + i * GRAM.size)
+                if not gram.startswith(prefix):
+                    break
+                ids.update(array('I', index[idsAt + first * 4:idsAt + (first + count) * 4]))
+            return ids
+
+        terms = [os.fsencode(term) for term in query.lower().split()]
+        candidates = None
+        for term in terms:
+            for gram in [term[i:i + 3] for i in range(len(term) - 2)] or [term]:
+                ids = blocksWith(gram)
+                candidates = ids if candidates is None else candidates & ids
+        first, rest = (terms[0], terms[1:]) if terms else (b'', [])
+        matches = []
+        for blockId in sorted(candidates) if candidates is not None else range(blockCount):
+            start, end = BLOCK_SPAN.unpack_from(index, spansAt + blockId * BLOCK_SPAN.size)
+            block = index[dataAt + start:dataAt + end]
+            lowered = block.lower()
+            if all(term in lowered for term in terms):
+                matches += [path for path, low in zip(block.split(b'\0'), lowered.split(b'\0')) if first in low]
+    if rest:
+        matches = [path for path in matches if all(term in path.lower() for term in rest)]
+    return rankMatches(query, matches, limit)
+
+def classEnd(pattern, i):
+    """Index of the ']' closing the class that opens at pattern[i]."""
+    j = i + 1
+    if pattern[j:j + 1] == '^':
+        j += 1
+    if pattern[j:j + 1] == ']':
+        j += 1  # a ']' first in the class is a literal
+    while j < len(pattern) and pattern[j] != ']':
+        j += 2 if pattern[j] == '\\' else 1
+    return j
+
+def groupEnd(pattern, i):
+    """Index of the ')' closing the group that opens at pattern[i]."""
+    depth, j = 0, i + 1
+    while j < len(pattern):
+        c = pattern[j]
+        if c == '\\':
+            j += 1
+        elif c == '[':
+            j = classEnd(pattern, j)
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            if not depth:
+                break
+            depth -= 1
+        j += 1
+    return j
+
+def requiredLiteral(pattern):
+    """Longest literal run every match of pattern must contain, or b'' when none is certain."""
+    if re.compile(pattern).flags & ~re.UNICODE:
+        return b''  # inline flags such as (?i) or (?x) change what the text means
+    runs, current, i = [], '', 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if escaped.isalnum():
+                # \x41, \101, \u00e9 and \N{...} go on past the letter, so rather
+                # than parse every kind of escape, give up on any letter or digit
+                return b''
+            current += escaped
+            i += 2
             continue
-        if extension and not path.name.endswith(extension):
+        if c == '|':
+            return b''  # top-level alternation: no single literal is required
+        if c in '*?{':
+            current = current[:-1]  # the previous character may be absent
+        if c == '{':
+            c = '}'
+            i = pattern.find('}', i) if '}' in pattern[i:] else len(pattern)
+        if c in '([':
+            # group and class contents may be optional or alternatives; skip them whole
+            j = classEnd(pattern, i) if c == '[' else groupEnd(pattern, i)
+            runs.append(current)
+            current = ''
+            i = j + 1
             continue
-        files.append(str(path))
-    return files
+        if c in '*?}.^$+)]':
+            runs.append(current)
+            current = ''
+        else:
+            current += c
+        i += 1
+    runs.append(current)
+    return max(runs, key=len).encode()
+
+def grepFile(path, regex, literal):
+    """[(lineNo, line)] for each line of path where regex matches, skipping binary files."""
+    try:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data.find(b'\0', 0, 8192) != -1:
+                    return []
+                if literal and data.find(literal) == -1:
+                    return []
+                hits, lineNo, counted, pos = [], 1, 0, 0
+                while True:
+                    match = regex.search(data, pos)
+                    if not match:
+                        return hits
+                    start = data.rfind(b'\n', 0, match.start()) + 1
+                    end = data.find(b'\n', match.start())
+                    if end == -1:
+                        end = len(data)
+                    lineNo += data[counted:start].count(b'\n')
+                    counted = start
+                    hits.append((lineNo, data[start:end].rstrip(b'\r').decode('utf-8', 'replace')))
+                    pos = end + 1
+                    if pos > len(data):
+                        return hits
+    except (OSError, ValueError):
+        return []
+
+def grepBatch(paths, pattern, literal):
+    regex = re.compile(pattern.encode(), re.MULTILINE)
+    return [f"{path}:{lineNo}:{line}" for path in paths for lineNo, line in grepFile(path, regex, literal)]
 
-def getPreviewCommand():
+def grepFiles(paths, pattern, workers=None, batchSize=64):
+    """Yield path:line:text for every matching line, searching batches of paths in parallel.
+
+    Results come back as batches finish, so the order follows completion
+    rather than the walk, and at most a few batches per worker are in flight.
+    """
+    literal = requiredLiteral(pattern)
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        batches = iter(lambda: list(itertools.islice(paths, batchSize)), [])
+        for batch in batches:
+            pending.add(executor.submit(grepBatch, batch, pattern, literal))
+            if len(pending) >= workers * 4:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from future.result()
+        for future in as_completed(pending):
+            yield from future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def getPreviewCommand(grepMode=False):
+    # --grep lines are path:line:text, so fzf splits them on ':' into {1} and {2}
     if shutil.which("bat"):
+        if grepMode:
+            return "bat --style=plain --color=always --highlight-line {2} {1}"
         return "bat --style=plain --color=always {}"
     elif os.name == 'nt':
-        return "type {}"
+        return "type {1}" if grepMode else "type {}"
     else:
-        return "head -n 30 {}"
+        return "tail -n +{2} {1} | head -n 30" if grepMode else "head -n 30 {}"
+
+def feedPaths(paths, pipe, done, source=None):
+    """Write paths to fzf's stdin as the walker finds them, stopping once fzf has exited.
+
+    source is the generator behind paths when paths wraps it (e.g. in
+    itertools.chain, which has no close). It is closed here, on the thread
+    that drives it, so the walk or a --grep worker pool shuts down with it.
+    """
+    try:
+        for path in paths:
+            if done.is_set():
+                break
+            pipe.write(path + '\n')
+        pipe.close()
+    except (BrokenPipeError, OSError, ValueError):
+        pass  # the user picked something before the walk finished
+    finally:
+        for gen in (paths, source):
+            if hasattr(gen, 'close'):
+                gen.close()
 
-def selectWithFzf(fileList, allowMulti=False, enablePreview=False):
+def selectWithFzf(fileList, allowMulti=False, enablePreview=False, grepMode=False, source=None):
+    """Run fzf over fileList, which may be a generator still walking the tree (see feedPaths for source)."""
     try:
         fzfCmd = ['fzf']
         if allowMulti:
             fzfCmd.append('--multi')
+        if grepMode:
+            fzfCmd += ['--delimiter', ':']
         if enablePreview:
-            fzfCmd += ['--preview', getPreviewCommand()]
-
-        result = subprocess.run(
-            fzfCmd,
-            input='\n'.join(fileList),
-            text=True,
-            stdout=subprocess.PIPE
-        )
-
-        if result.returncode == 0:
-            output = result.stdout.strip()
-            return output.split('\n') if allowMulti else output
-        return None
+            fzfCmd += ['--preview', getPreviewCommand(grepMode)]
+            if grepMode:
+                fzfCmd += ['--preview-window', '+{2}-/2']
+
+        # line buffering hands each path to fzf immediately
+        proc = subprocess.Popen(fzfCmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
     except FileNotFoundError:
         print("fzf not found. Please install it and ensure it's in PATH.")
+        if source is not None:
+            source.close()
         return None
 
+    done = threading.Event()
+    feeder = threading.Thread(target=feedPaths, args=(fileList, proc.stdin, done, source), daemon=True)
+    feeder.start()
+    output = proc.stdout.read()
+    returncode = proc.wait()
+    done.set()
+    feeder.join(timeout=1)
+
+    if returncode == 0:
+        output = output.strip()
+        return output.split('\n') if allowMulti else output
+    return None
+
 def openFiles(filePaths, editor):
     if not filePaths:
         return
@@ -66,20 +537,48 @@ def main():
     parser.add_argument('--preview', action='store_true', help='Show file preview in fzf')
     parser.add_argument('--open', action='store_true', help='Open selected files in default editor')
     parser.add_argument('--editor', type=str, default='code', help='Editor to open files with')
+    parser.add_argument('--no-ignore', action='store_true', help="Don't respect .gitignore/.ignore files")
+    parser.add_argument('--query', type=str, help='Rank matches from the file-name index instead of running fzf')
+    parser.add_argument('--limit', type=int, default=20, help='Number of --query results to print')
+    parser.add_argument('--update-index', action='store_true', help='Rescan changed directories into the index')
+    parser.add_argument('--grep', type=str, metavar='PATTERN', help='Search file contents for a regex instead of names')
+    parser.add_argument('-j', '--jobs', type=int, default=0, help='Worker processes for --grep (0 = all CPUs)')
 
     args = parser.parse_args()
-    fileList = getFileList(args.directory, args.ext)
 
-    if not fileList:
-        print("No matching files found.")
+    if args.query is not None or args.update_index:
+        if args.update_index or not indexCurrent(indexFiles(args.directory)[0]):
+            updateIndex(args.directory, not args.no_ignore)
+        if args.query is None:
+            return
+        root = str(Path(args.directory))
+        results = queryIndex(args.directory, args.query, args.limit)
+        for path in results:
+            print(path if root == '.' else os.path.join(root, path))
+        sys.exit(0 if results else 1)
+    paths = walkFiles(args.directory, args.ext, not args.no_ignore)
+    if args.grep is not None:
+        try:
+            re.compile(args.grep.encode(), re.MULTILINE)  # as grepBatch compiles it
+        except re.error as e:
+            sys.exit(f"Invalid pattern: {e}")
+        paths = grepFiles(paths, args.grep, args.jobs or None)
+    first = next(paths, None)
+
+    if first is None:
+        print("No matching lines found." if args.grep is not None else "No matching files found.")
         sys.exit(1)
 
-    selection = selectWithFzf(fileList, allowMulti=args.multi, enablePreview=args.preview)
+    selection = selectWithFzf(itertools.chain([first], paths), allowMulti=args.multi,
+                              enablePreview=args.preview, grepMode=args.grep is not None, source=paths)
 
     if selection:
         print("Selected file(s):")
         print(selection if isinstance(selection, str) else '\n'.join(selection))
         if args.open:
+            if args.grep is not None:
+                lines = [selection] if isinstance(selection, str) else selection
+                selection = list(dict.fromkeys(line.split(':', 1)[0] for line in lines))
             openFiles(selection, args.editor)
 
 if __name__ == '__main__':
@@ -1,34 +1,96 @@
 import os
+import sys
+import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def deleteEmptyFolders(rootDir):
+def scanDir(path):
+    subdirs, live = [], 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                else:
+                    live += 1
+    except OSError:
+        live += 1  # unreadable, so never treat it as empty
+    return subdirs, live
+
+def findEmptyFolders(rootDir):
+    """Return (depth, path) for every folder below rootDir that is empty or holds only empty folders.
+
+    One post-order scandir pass: each folder counts its files and non-empty
+    subfolders, and a folder whose count stays at zero makes no difference to
+    its parent's count, so whole empty subtrees are found in a single run.
+    """
     emptyFolders = []
-    for dirPath, dirNames, _ in os.walk(rootDir, topdown=False):
-        for dirName in dirNames:
-            fullPath = os.path.join(dirPath, dirName)
-            try:
-                if not os.listdir(fullPath):
-                    emptyFolders.append(fullPath)
-            except FileNotFoundError:
-                continue
+    stack = [[rootDir, 0, *scanDir(rootDir)]]
+    while stack:
+        path, depth, subdirs, live = stack[-1]
+        if subdirs:
+            child = subdirs.pop()
+            stack.append([child, depth + 1, *scanDir(child)])
+            continue
+        stack.pop()
+        if not stack:
+            break  # the root itself is kept
+        if live:
+            stack[-1][3] += 1
+        else:
+            emptyFolders.append((depth, path))
+    return emptyFolders
+
+def removeFolders(emptyFolders, jobs):
+    """rmdir the folders one depth level at a time, deepest first, each level in parallel."""
+    levels = {}
+    for depth, path in emptyFolders:
+        levels.setdefault(depth, []).append(path)
+
+    def tryRmdir(path):
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            return path, e.strerror
+        return None
+
+    deleted, failed = 0, []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for depth in sorted(levels, reverse=True):
+            for result in pool.map(tryRmdir, levels[depth], chunksize=64):
+                if result:
+                    failed.append(result)
+                else:
+                    deleted += 1
+    return deleted, failed
+
+def deleteEmptyFolders(rootDir, assumeYes=False, asJson=False, jobs=8):
+    emptyFolders = findEmptyFolders(rootDir)
+
+    if asJson:
+        deleted, failed = removeFolders(emptyFolders, jobs) if emptyFolders else (0, [])
+        json.dump({"root": rootDir, "found": len(emptyFolders), "deleted": deleted,
+                   "folders": [path for _, path in emptyFolders],
+                   "failed": [{"path": path, "error": error} for path, error in failed]}, sys.stdout)
+        print()
+        return
 
     if not emptyFolders:
         print("No empty folders found.")
         return
 
     print("The following empty folders will be deleted:")
-    for folder in emptyFolders:
+    for _, folder in emptyFolders:
         print(f"  - {folder}")
 
-    confirm = input("Are you sure you want to delete these folders? Type 'yes' to confirm: ").strip().lower()
+    if assumeYes:
+        confirm = "yes"
+    else:
+        confirm = input("Are you sure you want to delete these folders? Type 'yes' to confirm: ").strip().lower()
     if confirm == "yes":
-        deletedCount = 0
-        for folder in emptyFolders:
-            try:
-                os.rmdir(folder)
-                deletedCount += 1
-            except OSError:
-                print(f"Failed to delete: {folder}")
+        deletedCount, failed = removeFolders(emptyFolders, jobs)
+        for folder, _ in failed:
+            print(f"Failed to delete: {folder}")
         print(f"Deleted {deletedCount} empty folder(s).")
     else:
         print("Operation cancelled. No folders were deleted.")
@@ -36,8 +98,13 @@ def deleteEmptyFolders(rootDir):
 def main():
     parser = argparse.ArgumentParser(description="Delete all empty folders in the specified directory tree, with confirmation.")
     parser.add_argument("directory", nargs="?", default=".", help="Root directory to search (default: current directory)")
+    parser.add_argument("-y", "--yes", action="store_true", help="Delete without asking for confirmation")
+    parser.add_argument("--json", action="store_true", help="Print a JSON summary instead of the listing (requires --yes)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Folders removed in parallel (default: 8)")
     args = parser.parse_args()
-    deleteEmptyFolders(args.directory)
+    if args.json and not args.yes:
+        parser.error("--json runs unattended, so it needs --yes")
+    deleteEmptyFolders(args.directory, args.yes, args.json, args.jobs)
 
 if __name__ == "__main__":
     main()
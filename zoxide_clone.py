@@ -1,68 +1,516 @@
+# add and jump run from shell hooks, so module-level imports stay cheap:
+# json, typer and rapidfuzz are imported where they are used
+from __future__ import annotations
+
 import os
-import json
-import typer
-from pathlib import Path
-from rapidfuzz import fuzz
-from typing import Optional
+import sys
+import math
+import time
 
-app = typer.Typer()
-DB_PATH = Path.home() / ".zoi.json"
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
 
-def load_db():
-    if DB_PATH.exists():
-        with open(DB_PATH, "r") as f:
-            return json.load(f)
-    return {}
+DATA_DIR = os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "zoi")
+SNAPSHOT_PATH = os.path.join(DATA_DIR, "db.json")
+JOURNAL_PATH = os.path.join(DATA_DIR, "visits.log")
+LOCK_PATH = os.path.join(DATA_DIR, "compact.lock")
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or DATA_DIR, "zoi.sock")
+LEGACY_DB_PATH = os.path.expanduser("~/.zoi.json")
+COMPACT_BYTES = 256 * 1024  # journal size that triggers a background compaction
+HALF_LIFE = 7 * 24 * 3600   # a visit's weight halves every week
+MAX_TOTAL = 10000           # aging rescales all scores once their sum passes this
+MIN_SCORE = 0.05            # entries decayed below this are dropped when compacting
+TOP_K = 32                  # best fuzzy matches re-ranked by frecency
+MATCH_CUTOFF = 60
+HOOK_BATCH = 8              # directory changes the shell hook queues before running add
+FRECENCY_WEIGHT = 10        # points per decade of frecency, added to the 0-100 match score
+LOCK_OFFSET = 1 << 40       # byte msvcrt locks stand in for flock on, far past any data
 
-def save_db(data):
-    with open(DB_PATH, "w") as f:
-        json.dump(data, f, indent=4)
+# The store is a JSON snapshot of parallel columns (paths, lowercase match
+# keys, frecency scores and the time each score was last brought up to
+# date) plus an append-only journal of visits. Each visit is one O_APPEND
+# write, so concurrent shells never lose updates; compaction rotates the
+# journal out and folds it into the snapshot. Rotated journals are named in
+# the snapshot's "merged" list once folded in, so a crash between writing
+# the snapshot and deleting them never counts a visit twice.
 
-def add_path(path: str):
-    data = load_db()
-    if path in data:
-        data[path] += 1
+def columns(pairs):
+    """Snapshot columns for (path, score, last_access) triples."""
+    pairs = [*pairs]
+    return {"paths": [path for path, _, _ in pairs], "keys": [path.lower() for path, _, _ in pairs],
+            "scores": [score for _, score, _ in pairs], "last": [last for _, _, last in pairs]}
+
+def write_snapshot(snapshot):
+    import json
+    tmp = SNAPSHOT_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, SNAPSHOT_PATH)
+
+def read_snapshot():
+    import json
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return dict(columns(()), merged=[])
+    if "entries" in snapshot:
+        # visit-count snapshots from before frecency: treat counts as fresh scores
+        entries = snapshot.pop("entries")
+        snapshot.update(columns((path, score, last or time.time()) for path, (score, last) in entries.items()))
+    return snapshot
+
+def lock_file(fd, shared=False, blocking=True):
+    """flock fd, or where there is no fcntl take an msvcrt lock, which is always exclusive.
+
+    Raises BlockingIOError when not blocking and another process holds it.
+    """
+    if fcntl:
+        fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        return
+    # msvcrt locks are mandatory, so lock a byte readers never reach rather than the data
+    os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            if not blocking:
+                raise BlockingIOError("locked by another process") from None
+            time.sleep(0.01)
+
+def ensure_store():
+    """Create the store on first use, migrating ~/.zoi.json if it exists."""
+    if os.path.exists(SNAPSHOT_PATH):
+        return
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(LOCK_PATH, "w") as lock:
+        lock_file(lock.fileno())
+        if os.path.exists(SNAPSHOT_PATH):
+            return
+        legacy = {}
+        if os.path.exists(LEGACY_DB_PATH):
+            import json
+            with open(LEGACY_DB_PATH) as f:
+                legacy = json.load(f)
+        now = int(time.time())
+        write_snapshot(dict(columns((path, count, now) for path, count in legacy.items()), merged=[]))
+        if os.path.exists(LEGACY_DB_PATH):
+            os.replace(LEGACY_DB_PATH, LEGACY_DB_PATH + ".bak")
+
+def decayed(score, last, now):
+    return score * 0.5 ** (max(now - last, 0) / HALF_LIFE)
+
+def combine(score, last, other, other_last):
+    """Sum two decaying scores as of the later of their timestamps."""
+    latest = max(last, other_last)
+    return decayed(score, last, latest) + decayed(other, other_last, latest), latest
+
+def replay(journal, visits, offset=0):
+    """Fold journal visits from offset into visits; returns the offset after the last full line."""
+    import json
+    try:
+        with open(journal, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # an append still in flight; pick it up next time
+                offset += len(line)
+                try:
+                    timestamp, path = json.loads(line)
+                except (ValueError, TypeError):
+                    continue  # torn last line from a writer that crashed mid-append
+                # journals from concurrent shells can be slightly out of order; combine() doesn't care
+                visits[path] = combine(*visits.get(path, (0.0, timestamp)), 1, timestamp)
+    except FileNotFoundError:
+        pass
+    return offset
+
+def merge_journals(snapshot, journals):
+    """Fold the visits in journals into the snapshot's columns in place."""
+    visits = {}
+    for journal in journals:
+        replay(journal, visits)
+    merge_visits(snapshot, visits)
+    return snapshot
+
+def merge_visits(snapshot, visits, position=None):
+    if not visits:
+        return
+    paths, scores, last = snapshot["paths"], snapshot["scores"], snapshot["last"]
+    if position is None:
+        position = {path: i for i, path in enumerate(paths)}
+    for path, (score, timestamp) in visits.items():
+        i = position.get(path)
+        if i is None:
+            position[path] = len(paths)
+            paths.append(path)
+            snapshot["keys"].append(path.lower())
+            scores.append(score)
+            last.append(timestamp)
+        else:
+            scores[i], last[i] = combine(scores[i], last[i], score, timestamp)
+
+def age(snapshot, now):
+    """Drop vanished directories and rescale so the total score stays under MAX_TOTAL."""
+    current = [(path, decayed(score, last, now))
+               for path, score, last in zip(snapshot["paths"], snapshot["scores"], snapshot["last"])
+               if os.path.isdir(path)]
+    total = sum(score for _, score in current)
+    factor = min(1.0, MAX_TOTAL / total) if total else 1.0
+    return columns((path, score * factor, now) for path, score in current if score * factor >= MIN_SCORE)
+
+def rotated_journals():
+    prefix = os.path.basename(JOURNAL_PATH) + "."
+    return sorted(os.path.join(DATA_DIR, name) for name in os.listdir(DATA_DIR) if name.startswith(prefix))
+
+def load_index(include_journal=True):
+    """The snapshot's columns with every unmerged journal folded in."""
+    ensure_store()
+    snapshot = read_snapshot()
+    merged = set(snapshot["merged"])
+    pending = [journal for journal in rotated_journals() if os.path.basename(journal) not in merged]
+    if include_journal:
+        pending.append(JOURNAL_PATH)
+    return merge_journals(snapshot, pending)
+
+def append_visit(path: str) -> int:
+    """Append one visit to the journal and return the journal's new size."""
+    if path.isprintable() and '"' not in path and "\\" not in path:
+        record = f'[{int(time.time())}, "{path}"]\n'.encode()
     else:
-        data[path] = 1
-    save_db(data)
+        import json
+        record = (json.dumps([int(time.time()), path]) + "\n").encode()
+    while True:
+        fd = os.open(JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            # compaction renames the journal under LOCK_EX; if that happened
+            # after our open, write to the fresh journal instead
+            lock_file(fd, shared=True)
+            try:
+                current = os.stat(JOURNAL_PATH).st_ino
+            except FileNotFoundError:
+                current = None
+            if current == os.fstat(fd).st_ino:
+                os.write(fd, record)
+                return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+def rotate_journal():
+    """Move the journal aside for compaction; returns False if it could not be moved yet."""
+    if fcntl is None:
+        # Windows will not rename a file anyone has open, which shuts out appenders as LOCK_EX does
+        try:
+            os.replace(JOURNAL_PATH, f"{JOURNAL_PATH}.{time.time_ns()}")
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            return False
+        return True
+    try:
+        fd = os.open(JOURNAL_PATH, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    try:
+        lock_file(fd)
+        os.replace(JOURNAL_PATH, f"{JOURNAL_PATH}.{time.time_ns()}")
+    finally:
+        os.close(fd)
+    return True
+
+def compact():
+    with open(LOCK_PATH, "w") as lock:
+        try:
+            lock_file(lock.fileno(), blocking=False)
+        except BlockingIOError:
+            return  # another process is already compacting
+        snapshot = read_snapshot()
+        for name in snapshot["merged"]:
+            try:
+                os.unlink(os.path.join(DATA_DIR, name))
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                return  # Windows: still open in a reader; merging it again would count it twice
+        if not rotate_journal():
+            return
+        pending = rotated_journals()
+        snapshot = age(merge_journals(snapshot, pending), int(time.time()))
+        write_snapshot(dict(snapshot, merged=[os.path.basename(journal) for journal in pending]))
+        for journal in pending:
+            try:
+                os.unlink(journal)
+            except PermissionError:
+                pass  # named in "merged", so the next compaction removes it
+
+def compact_in_background():
+    if not hasattr(os, "fork"):
+        compact()  # no fork on Windows; this one add pays for the compaction
+        return
+    # double fork so the compactor is never left as a zombie of a long-lived caller
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    try:
+        if os.fork() == 0:
+            os.setsid()
+            compact()
+    finally:
+        os._exit(0)
 
-def best_match(keyword: str) -> Optional[str]:
-    data = load_db()
-    if not data:
+def add_path(path: str):
+    ensure_store()
+    if append_visit(path) > COMPACT_BYTES:
+        compact_in_background()
+
+def add_dirs(paths):
+    """Track each existing directory in paths; returns the ones recorded."""
+    added = []
+    for path in paths:
+        abs_path = os.path.abspath(path)
+        if os.path.isdir(abs_path):
+            add_path(abs_path)
+            added.append(abs_path)
+    return added
+
+def best_match(keyword: str, index=None) -> str | None:
+    from rapidfuzz import fuzz, process
+    index = index or load_index()
+    if not index["paths"]:
         return None
-    scored = []
-    for path, freq in data.items():
-        score = fuzz.partial_ratio(keyword.lower(), path.lower()) + freq
-        scored.append((score, path))
-    scored.sort(reverse=True)
-    return scored[0][1] if scored else None
-
-@app.command()
-def add(path: str = typer.Argument(..., help="Directory to track")):
-    abs_path = os.path.abspath(path)
-    if os.path.isdir(abs_path):
-        add_path(abs_path)
-        typer.echo(f"Added: {abs_path}")
-    else:
-        typer.echo("Not a valid directory.")
+    now = time.time()
+    candidates = process.extract(keyword.lower(), index["keys"], scorer=fuzz.partial_ratio, processor=None,
+                                 limit=TOP_K, score_cutoff=MATCH_CUTOFF)
+    ranked = sorted(((match + FRECENCY_WEIGHT * math.log10(1 + decayed(index["scores"][i], index["last"][i], now)),
+                      index["paths"][i]) for _, match, i in candidates), reverse=True)
+    for _, path in ranked:
+        # vanished directories are skipped here and pruned at the next compaction
+        if os.path.isdir(path):
+            return path
+    return None
 
-@app.command()
-def jump(keyword: str = typer.Argument(..., help="Keyword to search")):
-    match = best_match(keyword)
-    if match:
-        typer.echo(match)
-    else:
-        typer.echo("")
+def ask_helper(keyword: str) -> str | None:
+    """Match via a running `serve` helper; None when there is none."""
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.settimeout(1.0)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(keyword.replace("\n", " ").encode() + b"\n")
+            reply = sock.makefile("rb").readline()
+    except OSError:
+        return None
+    return reply.rstrip(b"\n").decode()
+
+def file_id(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino, st.st_mtime_ns if path == SNAPSHOT_PATH else 0
+
+class Helper:
+    """The store kept in memory, following the journal as other processes append to it."""
+
+    def __init__(self):
+        self.reload()
+
+    def reload(self):
+        self.snapshot_id = file_id(SNAPSHOT_PATH)
+        self.journal_id = file_id(JOURNAL_PATH)
+        self.index = load_index(include_journal=False)
+        self.position = {path: i for i, path in enumerate(self.index["paths"])}
+        self.offset = 0
+        self.follow()
+
+    def follow(self):
+        if file_id(SNAPSHOT_PATH) != self.snapshot_id or file_id(JOURNAL_PATH) != self.journal_id:
+            return self.reload()  # compacted or rotated since the last look
+        visits = {}
+        self.offset = replay(JOURNAL_PATH, visits, self.offset)
+        merge_visits(self.index, visits, self.position)
+
+def serve():
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        sys.exit("serve needs Unix domain sockets, which this platform lacks.")
+    if ask_helper("") is not None:
+        sys.exit("A helper is already running.")
+    helper = Helper()
+    try:
+        os.unlink(SOCKET_PATH)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX)
+    server.bind(SOCKET_PATH)
+    os.chmod(SOCKET_PATH, 0o600)
+    server.listen(16)
+    while True:
+        conn, _ = server.accept()
+        with conn:
+            try:
+                conn.settimeout(1.0)
+                keyword = conn.makefile("rb").readline().decode().strip()
+                helper.follow()
+                match = best_match(keyword, helper.index) if keyword else None
+                conn.sendall((match or "").encode() + b"\n")
+            except OSError:
+                pass
+
+def jump_to(keyword: str, pending=()):
+    add_dirs(pending)
+    match = ask_helper(keyword)
+    if match is None:
+        match = best_match(keyword)
+    return match or ""
+
+INIT_SCRIPTS = {
+    "bash": """
+__zoi_pending=()
+__zoi_flush() {
+    (( ${#__zoi_pending[@]} )) || return
+    ( %(cmd)s add -- "${__zoi_pending[@]}" >/dev/null 2>&1 & )
+    __zoi_pending=()
+}
+__zoi_hook() {
+    [[ "$PWD" == "$__zoi_last" ]] && return
+    __zoi_last=$PWD
+    __zoi_pending+=("$PWD")
+    (( ${#__zoi_pending[@]} >= %(batch)d )) && __zoi_flush
+}
+z() {
+    if (( $# == 0 )); then builtin cd ~; return; fi
+    if [[ $# == 1 && -d "$1" ]]; then builtin cd "$1"; return; fi
+    local args=() p dir
+    for p in "${__zoi_pending[@]}"; do args+=(--add "$p"); done
+    __zoi_pending=()
+    dir=$(%(cmd)s jump "${args[@]}" -- "$*") && [[ -n "$dir" ]] && builtin cd "$dir"
+}
+trap __zoi_flush EXIT
+PROMPT_COMMAND="__zoi_hook${PROMPT_COMMAND:+;$PROMPT_COMMAND}"
+""",
+    "zsh": """
+typeset -ga __zoi_pending
+__zoi_flush() {
+    (( ${#__zoi_pending} )) || return
+    %(cmd)s add -- "${__zoi_pending[@]}" >/dev/null 2>&1 &!
+    __zoi_pending=()
+}
+__zoi_hook() {
+    __zoi_pending+=("$PWD")
+    (( ${#__zoi_pending} >= %(batch)d )) && __zoi_flush
+}
+z() {
+    if (( $# == 0 )); then builtin cd ~; return; fi
+    if [[ $# == 1 && -d "$1" ]]; then builtin cd "$1"; return; fi
+    local args=() p dir
+    for p in "${__zoi_pending[@]}"; do args+=(--add "$p"); done
+    __zoi_pending=()
+    dir=$(%(cmd)s jump "${args[@]}" -- "$*") && [[ -n "$dir" ]] && builtin cd "$dir"
+}
+autoload -Uz add-zsh-hook
+add-zsh-hook chpwd __zoi_hook
+add-zsh-hook zshexit __zoi_flush
+""",
+    "fish": """
+set -g __zoi_pending
+function __zoi_flush --on-event fish_exit
+    test (count $__zoi_pending) -gt 0; or return
+    command %(cmd)s add -- $__zoi_pending >/dev/null 2>&1 &
+    disown 2>/dev/null
+    set -g __zoi_pending
+end
+function __zoi_hook --on-variable PWD
+    set -ga __zoi_pending $PWD
+    test (count $__zoi_pending) -ge %(batch)d; and __zoi_flush
+end
+function z
+    if test (count $argv) -eq 0; cd ~; return; end
+    if test (count $argv) -eq 1 -a -d "$argv[1]"; cd $argv[1]; return; end
+    set -l args
+    for p in $__zoi_pending; set -a args --add $p; end
+    set -g __zoi_pending
+    set -l dir (command %(cmd)s jump $args -- "$argv")
+    and test -n "$dir"; and cd $dir
+end
+""",
+}
+
+def init_script(shell: str) -> str:
+    import shlex
+    cmd = " ".join(shlex.quote(part) for part in (sys.executable, os.path.abspath(__file__)))
+    return INIT_SCRIPTS[shell].lstrip("\n") % {"cmd": cmd, "batch": HOOK_BATCH}
+
+def build_app():
+    import typer
+    app = typer.Typer()
+
+    @app.command()
+    def add(paths: list[str] = typer.Argument(..., help="Directories to track")):
+        for path in paths:
+            if add_dirs([path]):
+                typer.echo(f"Added: {os.path.abspath(path)}")
+            else:
+                typer.echo("Not a valid directory.")
+
+    @app.command()
+    def jump(keyword: str = typer.Argument(..., help="Keyword to search"),
+             add: list[str] = typer.Option([], "--add", help="Record these visits first")):
+        typer.echo(jump_to(keyword, add))
+
+    @app.command(name="list")
+    def list_dirs():
+        index = load_index()
+        if not index["paths"]:
+            typer.echo("No directories tracked yet.")
+            return
+        now = time.time()
+        frecency = [decayed(score, last, now) for score, last in zip(index["scores"], index["last"])]
+        for score, path in sorted(zip(frecency, index["paths"]), reverse=True):
+            typer.echo(f"{score:7.2f}  {path}")
+
+    @app.command()
+    def init(shell: str = typer.Argument(..., help="bash, zsh or fish")):
+        """Print the shell hook; e.g. eval "$(zoxide_clone.py init bash)"."""
+        if shell not in INIT_SCRIPTS:
+            raise typer.BadParameter(f"unsupported shell: {shell}")
+        typer.echo(init_script(shell), nl=False)
+
+    @app.command(name="serve")
+    def serve_command():
+        """Keep the index in memory and answer jumps over a Unix socket."""
+        serve()
+
+    return app
 
-@app.command()
-def list():
-    data = load_db()
-    if not data:
-        typer.echo("No directories tracked yet.")
+def main(argv):
+    # add and jump run on every cd and prompt, so they skip typer and rapidfuzz imports
+    if argv[:1] == ["add"] and "--help" not in argv:
+        for path in argv[1:]:
+            if path == "--":
+                continue
+            print(f"Added: {os.path.abspath(path)}" if add_dirs([path]) else "Not a valid directory.")
         return
-    sorted_data = sorted(data.items(), key=lambda x: x[1], reverse=True)
-    for path, freq in sorted_data:
-        typer.echo(f"{freq:3}  {path}")
+    if argv[:1] == ["jump"] and "--help" not in argv:
+        pending, words, args = [], [], iter(argv[1:])
+        for arg in args:
+            if arg == "--add":
+                pending.append(next(args, ""))
+            elif arg != "--":
+                words.append(arg)
+        if words:
+            print(jump_to(" ".join(words), pending))
+            return
+    build_app()()
 
 if __name__ == "__main__":
-    app()
+    main(sys.argv[1:])